@@ -4,5 +4,7 @@
 """
 
 from .instruments import EqOption, FutOption, FXOption, ComOption
+from .engineconfig import ImpliedVolTracker
+from .marketenvironment import MarketEnvironment
 from .optionstrategies import OptionStr1Udl, StdStrategies
 from .plotting import Plotting
\ No newline at end of file
@@ -3,7 +3,12 @@
 
 """
 
-from .namesnmapper import MODEL_MAPPER, IV_MODELS, ANALYTICAL_GREEKS, OBJECT_MODEL
+import copy
+
+import pandas as pd
+
+from .namesnmapper import MODEL_MAPPER, IV_MODELS, ANALYTICAL_GREEKS, OBJECT_MODEL, LATTICE_MODELS, DEFAULT_MODEL, \
+    ExpiryType
 from .numericalgreeks import NumericalGreeks
 
 
@@ -12,21 +17,59 @@ class PricingEngine:
         Maps engine from instrument to model class.
     """
 
-    def __init__(self, instrument, model, **kwargs):
+    def __init__(self, instrument, model, market=None, **kwargs):
         self.instrument = instrument
         self._model = model
+        self.market = market
+        if market is not None:
+            #   quantities precomputed by the snapshot are for its own dividends, rate and pricing date
+            for _derived, _inputs in market.derived_fields.items():
+                if set(_inputs).intersection(kwargs):
+                    kwargs.setdefault(_derived, None)
+        self._market_overrides = set(kwargs)
+        if market is not None:
+            kwargs = dict(market.market_kwargs(instrument), **kwargs)
+            market.register(self)
         self._other_args = kwargs
         self.check_model = self.model_check()
+        self._model_instance = None
 
     @property
     def _model_class(self):
         """
-        Maps pricing model class according to the type of Instrument
+        Maps pricing model class according to the type of Instrument. The model is built on first use and
+        kept by the engine, market changes are applied to it through update().
             Args required:
                 model: pricing model given as argument or the default value(default value set to BSM for European expiry)
                 **kwargs: Dictionary of parameters and their corresponding value required for valuation
         """
-        return MODEL_MAPPER[self._model](self.instrument, **self._other_args)
+        if self._model_instance is None:
+            self._model_instance = MODEL_MAPPER[self._model](self.instrument, **self._other_args)
+        return self._model_instance
+
+    def update(self, **market_kwargs):
+        """
+        Changes market data of the engine in place e.g. engine.update(spot0=101.5, volatility=0.22).
+        The pricing model is not rebuilt, only its derived quantities are invalidated.
+            Args required:
+                **market_kwargs: market arguments of the engine() of the instrument (e.g. yield_div, fwd0,
+                                 rf_rate_local) or model parameters (e.g. spot0, cnv_yield, pricing_date, div_list).
+                                 AttributeError is raised for a parameter not used by the model.
+        """
+        self._update_model(**self.instrument.model_kwargs(**market_kwargs))
+
+    def _update_model(self, **model_kwargs):
+        self._model_class.update(**model_kwargs)
+        self._other_args.update(model_kwargs)
+
+    def market_update(self, **market_kwargs):
+        """
+        Called by the MarketEnvironment of the engine when one of its fields is set.
+        Parameters given explicitly to the engine and the ones not used by the model are not passed on.
+        """
+        #   fields of the snapshot are model parameters already, no instrument alias applies
+        self._update_model(**{_name: _value for _name, _value in market_kwargs.items()
+                               if _name not in self._market_overrides and self._model_class.update_target(_name)})
 
     def model_check(self):
         """
@@ -101,16 +144,101 @@ class PricingEngine:
         else:
             return self.risk_parameters_num_func()
 
-    def imply_volatility(self, premium):
+    def imply_volatility(self, premium, full_output=False, **solver_kwargs):
         """
         Maps to the imply_volatility method defined in pricingmodels module under required model class.
             Args required:
-                **kwargs: Dictionary of parameters and their corresponding value required for valuation.
-                For the implied volatility calculation in addition to the **kwargs premium is also taken as input
+                premium: (Float or array) premium(s) for which volatility is implied. For an array of premiums
+                         an array of volatilities is returned with nan where the solver did not converge.
+                full_output: (Boolean) if True returns ImpliedVolatility(volatility, converged, iterations)
+                **solver_kwargs: vol_guess, xtol and max_iter.
                 For arguments required and method available for each model check\
                 help(.derivativepricing.pricingmodels.<model name>)
         """
         if self._model in IV_MODELS:
-            return self._model_class.imply_volatility(premium)
+            return self._model_class.imply_volatility(premium, full_output=full_output, **solver_kwargs)
         else:
             raise NameError("implied volatility method not defined for " + self._model + " model")
+
+    def convergence_report(self, steps=(25, 50, 100, 200, 400, 800), models=None):
+        """
+        Premium error of the lattice models against the closed form model (BSM/B76/GK) for the European
+        version of the instrument, with the market data of the engine.
+            Args required:
+                steps: (List of Integers) no_of_steps to value the lattice models with e.g. [25, 50, 100]
+                models: (List of Strings) lattice models to compare, default is all of LATTICE_MODELS
+            Returns:
+                pandas DataFrame of lattice premium minus closed form premium, indexed by no_of_steps
+                with one column per model
+        """
+        _instrument = copy.copy(self.instrument)
+        _instrument.expiry_type = ExpiryType.EUROPEAN.value
+        _closed_form = DEFAULT_MODEL[_instrument.undl][_instrument.derivative_type][_instrument.expiry_type]
+        _market_kwargs = {_name: _value for _name, _value in self._other_args.items() if _name != 'no_of_steps'}
+        _reference = MODEL_MAPPER[_closed_form](_instrument, **_market_kwargs).valuation()
+        return pd.DataFrame({_model: [MODEL_MAPPER[_model](_instrument, no_of_steps=_steps, **_market_kwargs)
+                                      .valuation() - _reference for _steps in steps]
+                             for _model in (models or LATTICE_MODELS)},
+                            index=pd.Index(steps, name='no_of_steps'))
+
+
+class ImpliedVolTracker:
+    """
+    Implied volatility for ticking quotes. The last solution of every instrument is kept and used as the
+    starting point of the next solve:
+        - the model is evaluated once at the last volatility;
+        - if the premium is within tolerance nothing else is done;
+        - if the error of the vega linearised estimate (volga term) is within tolerance that estimate is used;
+        - otherwise the solver is warm started from the linearised estimate.
+    In steady state this costs one or two pricing evaluations per tick.
+        Args required:
+            tolerance = (Float) premium tolerance e.g. 1e-6
+            **solver_kwargs = xtol and max_iter passed to the solver.
+            help(.derivativepricing.pricingmodels.BSMFrameworkBatch.imply_volatility)
+    """
+
+    def __init__(self, tolerance=1e-6, **solver_kwargs):
+        self.tolerance = tolerance
+        self.solver_kwargs = solver_kwargs
+        self._last_volatility = {}
+
+    def imply_volatility(self, engine, premium):
+        """
+        Implied volatility of the instrument of the engine for the quoted premium
+            Args required:
+                engine: PricingEngine of the instrument with current market data (model in IV_MODELS)
+                premium: (Float) quoted premium
+        """
+        if engine._model not in IV_MODELS:
+            raise NameError("implied volatility method not defined for " + engine._model + " model")
+        _batch = engine._model_class.batch()
+        _last_vol = self._last_volatility.get(engine.instrument)
+
+        if _last_vol is None:
+            _vol = _batch.imply_volatility(premium, **self.solver_kwargs)
+        else:
+            _price, _vega, _d1, _d2 = _batch.price_vega(_last_vol)
+            _diff = premium - _price
+            if abs(_diff) <= self.tolerance:
+                return _last_vol
+            _step = _diff / _vega
+            _volga = _vega * _d1 * _d2 / _last_vol
+            if abs(0.5 * _volga * _step ** 2) <= self.tolerance and _last_vol + _step > 0:
+                _vol = _last_vol + _step
+            else:
+                _vol = _batch.imply_volatility(premium, vol_guess=max(_last_vol + _step, _last_vol / 2),
+                                               **self.solver_kwargs)
+        _vol = float(_vol)
+        if _vol != _vol:
+            raise ValueError("Unable to converge to implied volatility")
+        self._last_volatility[engine.instrument] = _vol
+        return _vol
+
+    def reset(self, instrument=None):
+        """
+        Drops the stored solution of the instrument (of all the instruments if None)
+        """
+        if instrument is None:
+            self._last_volatility.clear()
+        else:
+            self._last_volatility.pop(instrument, None)
@@ -4,9 +4,19 @@
 """
 
 from datetime import datetime as dt
+from functools import wraps
 from math import e
 
 
+def parse_date(date):
+    """
+    Dates are given as strings in "YYYYMMDD" format, already parsed datetime objects are returned as they are
+    """
+    if isinstance(date, dt):
+        return date
+    return dt.strptime(date, '%Y%m%d')
+
+
 def dividend_processor(div_list, pricing_date, expiry_date):
     div_processed = []
     if div_list:
@@ -28,5 +38,26 @@ def pv_div(div_processed, time_point, disc_rate):
     return pv_div_amount
 
 
-
-
+def dividend_pv(div_list, div_processed, pricing_date, expiry_date, disc_rate):
+    """
+    Present value at the pricing date of the discrete dividends, div_processed when given else div_list
+    """
+    if div_processed is None:
+        div_processed = dividend_processor(div_list, pricing_date, expiry_date)
+    return pv_div(div_processed, 0, disc_rate)
+
+
+def market_cached(func):
+    """
+    Read only property whose value is stored in the model's _market_cache on first access.
+    The cache is dropped by Model.__setattr__ whenever an attribute of the model is set.
+    """
+    _name = func.__name__
+
+    @wraps(func)
+    def _cached_func(self):
+        _cache = self.__dict__.setdefault('_market_cache', {})
+        if _name not in _cache:
+            _cache[_name] = func(self)
+        return _cache[_name]
+    return property(_cached_func)
@@ -17,23 +17,41 @@ class Instrument(metaclass=ABCMeta):
     @abstract functions:
         payoff => defines payoff on instrument.
         engine => attach the instrument with the pricing model and market data.
+    engine_alias maps the market arguments of engine() to the names used by the pricing models, the engine
+    maps the arguments of update() through it as well.
     """
+    engine_alias = {}
 
     @abstractmethod
     def payoff(self):
         pass
 
+    def model_kwargs(self, **market_kwargs):
+        """
+        Market arguments of engine() or engine.update() renamed to the arguments of the pricing models
+        e.g. yield_div of EqOption to cnv_yield. Names used by the models themselves are passed unchanged.
+        """
+        _model_kwargs = {}
+        for _name, _value in market_kwargs.items():
+            for _model_name in self.engine_alias.get(_name, (_name,)):
+                _model_kwargs[_model_name] = _value
+        return _model_kwargs
+
     def engine(self, **kwargs):
         """
         Binds pricing model class and market data to the object
             Args required:
                 model: pricing model (default value set to BSM for European expiry)
+                market: MarketEnvironment snapshot shared with other engines in place of raw market data.
+                        Arguments given explicitly (not None) override the snapshot for this engine only.
                 **kwargs: Dictionary of parameters and their corresponding value required for valuation.
                 For arguments required and method available for each model check\
                 help(.derivativepricing.pricingmodels.<model name>)
         """
         if not kwargs['model']:
             kwargs['model'] = DEFAULT_MODEL[self.undl][self.derivative_type][self.expiry_type]
+        if kwargs.get('market') is not None:
+            kwargs = {_name: _value for _name, _value in kwargs.items() if _value is not None}
         return PricingEngine(self, **kwargs)
 
     def list_models(self):
@@ -98,8 +116,10 @@ class EqOption(VanillaOption):
         super().__init__(option_type, expiry_type, strike, expiry_date, derivative_type)
         self.undl = UdlType.STOCK.value
 
-    def engine(self, model=None, spot0=None, rf_rate=0, yield_div=0, div_list=None, volatility=None,
-               pricing_date=None, **kwargs):
+    engine_alias = {'yield_div': ('cnv_yield',)}
+
+    def engine(self, model=None, spot0=None, rf_rate=None, yield_div=None, div_list=None, volatility=None,
+               pricing_date=None, market=None, **kwargs):
         """
         Binds pricing model class and market data to the object
             Args required:
@@ -115,6 +135,9 @@ class EqOption(VanillaOption):
                     yield_div: (Float < 1) div yield continuously compounded (for index options) e.g. 5% as 0.05
                     div_list: List of tuples for discrete dividends with dates. e.g. [("20180610", 2), ("20180624", 4)]
                               [("Date", div amount),...]
+                    market: MarketEnvironment snapshot used in place of the market arguments above,
+                            market arguments given explicitly override the snapshot for this engine only.
+                            help(.derivativepricing.marketenvironment.MarketEnvironment)
                 Model specific arguments:
                     MonteCarlo
                         no_of_path = (Integer). Number of paths to be generated for simulation e.g. 10000
@@ -123,12 +146,13 @@ class EqOption(VanillaOption):
                         antithetic = (Boolean). A variance reduction process in Montecarlo Simulation.
                                      Default False
                     Binomial
-                        no_of_steps = (Integer). Number of steps (nodes) for the premium calculation.
-                                       Maximum value accepted is 100. This limit will be increased
-                                       in future release.
+                        no_of_steps = (Integer). Number of steps (nodes) for the premium calculation e.g. 1000
+                                       There is no upper limit, the tree is valued by backward induction on
+                                       numpy arrays (time grows with no_of_steps**2, memory with no_of_steps).
                 """
-        return super().engine(model=model, spot0=spot0, rf_rate=rf_rate, cnv_yield=yield_div, pv_cnv=0,
-                              div_list=div_list, volatility=volatility, pricing_date=pricing_date, **kwargs)
+        return super().engine(model=model, market=market, **self.model_kwargs(
+            spot0=spot0, rf_rate=rf_rate, yield_div=yield_div, div_list=div_list, volatility=volatility,
+            pricing_date=pricing_date), **kwargs)
 
 
 class FutOption(VanillaOption):
@@ -148,7 +172,10 @@ class FutOption(VanillaOption):
         super().__init__(option_type, expiry_type, strike, expiry_date, derivative_type)
         self.undl = UdlType.FUTURES.value
 
-    def engine(self, model=None, fwd0=None, rf_rate=0, volatility=None, pricing_date=None, **kwargs):
+    engine_alias = {'fwd0': ('spot0',), 'rf_rate': ('rf_rate', 'cnv_yield')}
+
+    def engine(self, model=None, fwd0=None, rf_rate=None, volatility=None, pricing_date=None, market=None,
+               **kwargs):
         """
         Binds pricing model class and market data to the object
             Args required:
@@ -161,6 +188,9 @@ class FutOption(VanillaOption):
                                 Volatility in decimal e.g. Volatility of 10% => 0.10
                     pricing_Date: Date on which option value need to be calculated.
                                   (Date in string format "YYYYMMDD") e.g. 10 Dec 2018 as "20181210".
+                    market: MarketEnvironment snapshot used in place of the market arguments above,
+                            market arguments given explicitly override the snapshot for this engine only.
+                            help(.derivativepricing.marketenvironment.MarketEnvironment)
                 Model specific arguments:
                     MonteCarlo
                         no_of_path = (Integer). Number of paths to be generated for simulation e.g. 10000
@@ -169,12 +199,12 @@ class FutOption(VanillaOption):
                         antithetic = (Boolean). A variance reduction process in Montecarlo Simulation.
                                      Default False
                     Binomial
-                        no_of_steps = (Integer). Number of steps (nodes) for the premium calculation.
-                                       Maximum value accepted is 100. This limit will be increased
-                                       in future release.
+                        no_of_steps = (Integer). Number of steps (nodes) for the premium calculation e.g. 1000
+                                       There is no upper limit, the tree is valued by backward induction on
+                                       numpy arrays (time grows with no_of_steps**2, memory with no_of_steps).
         """
-        return super().engine(model=model, spot0=fwd0, rf_rate=rf_rate, cnv_yield=rf_rate,
-                              volatility=volatility, pricing_date=pricing_date, **kwargs)
+        return super().engine(model=model, market=market, **self.model_kwargs(
+            fwd0=fwd0, rf_rate=rf_rate, volatility=volatility, pricing_date=pricing_date), **kwargs)
 
 
 class FXOption(VanillaOption):
@@ -194,8 +224,10 @@ class FXOption(VanillaOption):
         super().__init__(option_type, expiry_type, strike, expiry_date, derivative_type)
         self.undl = UdlType.FX.value
 
-    def engine(self, model=None, spot0=None, rf_rate_local=0, rf_rate_foreign=0, volatility=None,
-               pricing_date=None, **kwargs):
+    engine_alias = {'rf_rate_local': ('rf_rate',), 'rf_rate_foreign': ('cnv_yield',)}
+
+    def engine(self, model=None, spot0=None, rf_rate_local=None, rf_rate_foreign=None, volatility=None,
+               pricing_date=None, market=None, **kwargs):
         """
         Binds pricing model class and market data to the object
             Args required:
@@ -211,6 +243,9 @@ class FXOption(VanillaOption):
                                 Volatility in decimal e.g. Volatility of 10% => 0.10
                     pricing_Date: Date on which option value need to be calculated.
                                   (Date in string format "YYYYMMDD") e.g. 10 Dec 2018 as "20181210".
+                    market: MarketEnvironment snapshot used in place of the market arguments above,
+                            market arguments given explicitly override the snapshot for this engine only.
+                            help(.derivativepricing.marketenvironment.MarketEnvironment)
                 Model specific arguments:
                     MonteCarlo
                         no_of_path = (Integer). Number of paths to be generated for simulation e.g. 10000
@@ -219,12 +254,13 @@ class FXOption(VanillaOption):
                         antithetic = (Boolean). A variance reduction process in Montecarlo Simulation.
                                      Default False
                     Binomial
-                        no_of_steps = (Integer). Number of steps (nodes) for the premium calculation.
-                                       Maximum value accepted is 100. This limit will be increased
-                                       in future release.
+                        no_of_steps = (Integer). Number of steps (nodes) for the premium calculation e.g. 1000
+                                       There is no upper limit, the tree is valued by backward induction on
+                                       numpy arrays (time grows with no_of_steps**2, memory with no_of_steps).
         """
-        return super().engine(model=model, spot0=spot0, rf_rate=rf_rate_local, cnv_yield=rf_rate_foreign,
-                              volatility=volatility, pricing_date=pricing_date, **kwargs)
+        return super().engine(model=model, market=market, **self.model_kwargs(
+            spot0=spot0, rf_rate_local=rf_rate_local, rf_rate_foreign=rf_rate_foreign, volatility=volatility,
+            pricing_date=pricing_date), **kwargs)
 
 
 class ComOption(VanillaOption):
@@ -243,8 +279,8 @@ class ComOption(VanillaOption):
         super().__init__(option_type, expiry_type, strike, expiry_date, derivative_type)
         self.undl = UdlType.COMMODITY.value
 
-    def engine(self, model=None, spot0=None, rf_rate=0, cnv_yield=0, cost_yield=0, volatility=None,
-               pricing_date=None, **kwargs):
+    def engine(self, model=None, spot0=None, rf_rate=None, cnv_yield=None, cost_yield=None, volatility=None,
+               pricing_date=None, market=None, **kwargs):
         """
         Binds pricing model class and market data to the object
             Args required:
@@ -259,6 +295,9 @@ class ComOption(VanillaOption):
                                 Volatility in decimal e.g. Volatility of 10% => 0.10
                     pricing_Date: Date on which option value need to be calculated.
                                   (Date in string format "YYYYMMDD") e.g. 10 Dec 2018 as "20181210".
+                    market: MarketEnvironment snapshot used in place of the market arguments above,
+                            market arguments given explicitly override the snapshot for this engine only.
+                            help(.derivativepricing.marketenvironment.MarketEnvironment)
                 Model specific arguments:
                     MonteCarlo
                         no_of_path = (Integer). Number of paths to be generated for simulation e.g. 10000
@@ -267,9 +306,9 @@ class ComOption(VanillaOption):
                         antithetic = (Boolean). A variance reduction process in Montecarlo Simulation.
                                      Default False
                     Binomial
-                        no_of_steps = (Integer). Number of steps (nodes) for the premium calculation.
-                                       Maximum value accepted is 100. This limit will be increased
-                                       in future release.
+                        no_of_steps = (Integer). Number of steps (nodes) for the premium calculation e.g. 1000
+                                       There is no upper limit, the tree is valued by backward induction on
+                                       numpy arrays (time grows with no_of_steps**2, memory with no_of_steps).
         """
         return super().engine(model=model, spot0=spot0, rf_rate=rf_rate, cnv_yield=cnv_yield, cost_yield=cost_yield,
-                              volatility=volatility, pricing_date=pricing_date, **kwargs)
+                              volatility=volatility, pricing_date=pricing_date, market=market, **kwargs)
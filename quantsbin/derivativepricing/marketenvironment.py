@@ -0,0 +1,105 @@
+"""
+    developed by Quantsbin - Jun'18
+
+"""
+
+from math import e
+import weakref
+
+from .helperfn import parse_date, dividend_processor, pv_div
+
+
+class MarketEnvironment:
+    """
+    Market snapshot of one underlying shared by many pricing engines.
+    The pricing date is parsed once, dividends are processed and discounted and the discount factor is computed
+    once per expiry date, every engine created with market=<MarketEnvironment> references the snapshot instead of
+    copying it.
+    Setting a field on the snapshot updates all the live engines built on it (market.spot0 = 101.5).
+        Args required:
+            spot0 = (Float) current underlying price/value e.g. 110.0 (futures price for FutOption)
+            rf_rate = (Float < 1) risk free continuously compounded discount rate e.g. 5% as 0.05
+            cnv_yield = (Float < 1) dividend yield for EqOption, foreign risk free rate for FXOption,
+                        convenience yield for ComOption e.g. 0.02
+            cost_yield = (Float < 1) cost yield for ComOption e.g. 0.01
+            volatility = (Float < 1) Underlying price/value return annualized volatility e.g. 0.25
+            pricing_date = (Date in string format "YYYYMMDD") e.g. 10 Dec 2018 as "20181210"
+            div_list = List of tuples for discrete dividends with dates. e.g. [("20180610", 2), ("20180624", 4)]
+    """
+    market_fields = ('spot0', 'rf_rate', 'cnv_yield', 'cost_yield', 'volatility', 'pricing_date', 'div_list')
+    #   quantities precomputed for the models and the fields (or quantities) they are derived from
+    derived_fields = {'div_processed': ('div_list', 'pricing_date'),
+                      'dividend_pv': ('div_list', 'div_processed', 'pricing_date', 'rf_rate'),
+                      'discount_factor': ('pricing_date', 'rf_rate')}
+
+    def __init__(self, spot0=None, rf_rate=0, cnv_yield=0, cost_yield=0, volatility=None, pricing_date=None,
+                 div_list=None):
+        object.__setattr__(self, '_engines', weakref.WeakSet())
+        object.__setattr__(self, '_cache', {})
+        self.spot0 = spot0
+        self.rf_rate = rf_rate
+        self.cnv_yield = cnv_yield
+        self.cost_yield = cost_yield
+        self.volatility = volatility
+        self.pricing_date = pricing_date
+        self.div_list = div_list
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in self.market_fields:
+            self._cache.clear()
+            for engine in list(self._engines):
+                engine.market_update(**self._changed_kwargs(name, engine.instrument))
+
+    def __getstate__(self):
+        _state = self.__dict__.copy()
+        _state['_engines'] = None
+        return _state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        object.__setattr__(self, '_engines', weakref.WeakSet())
+
+    def _cached(self, key, func):
+        if key not in self._cache:
+            self._cache[key] = func()
+        return self._cache[key]
+
+    @property
+    def parsed_pricing_date(self):
+        return self._cached('pricing_date', lambda: parse_date(self.pricing_date))
+
+    def div_processed(self, expiry_date):
+        return self._cached(('div_processed', expiry_date),
+                            lambda: dividend_processor(self.div_list, self.parsed_pricing_date, expiry_date))
+
+    def dividend_pv(self, expiry_date):
+        return self._cached(('dividend_pv', expiry_date, self.rf_rate),
+                            lambda: pv_div(self.div_processed(expiry_date), 0, self.rf_rate or 0))
+
+    def discount_factor(self, expiry_date):
+        if self.parsed_pricing_date is None:
+            return None
+        return self._cached(('discount_factor', expiry_date, self.rf_rate),
+                            lambda: e ** (-1 * (self.rf_rate or 0) * ((expiry_date - self.parsed_pricing_date).days
+                                                                      / 365.0)))
+
+    def market_kwargs(self, instrument):
+        """
+        Model arguments of the snapshot for the instrument
+        """
+        return {'spot0': self.spot0, 'rf_rate': self.rf_rate, 'cnv_yield': self.cnv_yield,
+                'cost_yield': self.cost_yield, 'volatility': self.volatility,
+                'pricing_date': self.parsed_pricing_date, 'div_list': self.div_list,
+                'div_processed': self.div_processed(instrument.expiry_date),
+                'dividend_pv': self.dividend_pv(instrument.expiry_date),
+                'discount_factor': self.discount_factor(instrument.expiry_date)}
+
+    def _changed_kwargs(self, name, instrument):
+        _market_kwargs = self.market_kwargs(instrument)
+        #   the field first, the models drop their precomputed quantities when one of their inputs is set
+        return {_name: _market_kwargs[_name] for _name in [name] + [_derived for _derived, _inputs in
+                                                                    self.derived_fields.items() if name in _inputs]}
+
+    def register(self, engine):
+        self._engines.add(engine)
@@ -24,6 +24,17 @@ class PricingModel(Enum):
     MC_GBM = "MC_GBM"
     MC_GBM_LSM = "MC_GBM_LSM"
     BINOMIAL = "Binomial"
+    BINOMIAL_BBS = "Binomial_BBS"
+    BINOMIAL_BBSR = "Binomial_BBSR"
+    TRINOMIAL = "Trinomial"
+    BARONE_ADESI_WHALEY = "BAW"
+    BJERKSUND_STENSLAND = "BjS2002"
+    FINITE_DIFFERENCE = "FD_CN"
+
+
+class ControlVariate(Enum):
+    UNDERLYING = 'Underlying'
+    EUROPEAN = 'European'
 
 
 class UnderlyingParameters(Enum):
@@ -70,19 +81,30 @@ class DivType(Enum):
     YIELD = 'Yield'
 
 
+AMERICAN_APPROX_MODELS = [PricingModel.BARONE_ADESI_WHALEY.value, PricingModel.BJERKSUND_STENSLAND.value]
+
+LATTICE_MODELS = [PricingModel.BINOMIAL.value, PricingModel.BINOMIAL_BBS.value, PricingModel.BINOMIAL_BBSR.value,
+                  PricingModel.TRINOMIAL.value]
+
+PDE_MODELS = [PricingModel.FINITE_DIFFERENCE.value]
+
 OBJECT_MODEL = {
     UdlType.STOCK.value: {ExpiryType.EUROPEAN.value: [PricingModel.BLACKSCHOLESMERTON.value, PricingModel.MC_GBM.value
-                          , PricingModel.BINOMIAL.value],
-                          ExpiryType.AMERICAN.value: [PricingModel.MC_GBM.value, PricingModel.BINOMIAL.value]}
+                          ] + LATTICE_MODELS + PDE_MODELS,
+                          ExpiryType.AMERICAN.value: [PricingModel.MC_GBM.value] + LATTICE_MODELS + PDE_MODELS
+                          + AMERICAN_APPROX_MODELS}
     , UdlType.FUTURES.value: {ExpiryType.EUROPEAN.value: [PricingModel.BLACK76.value, PricingModel.MC_GBM.value
-                              , PricingModel.BINOMIAL.value],
-                              ExpiryType.AMERICAN.value:  [PricingModel.MC_GBM.value, PricingModel.BINOMIAL.value]}
+                              ] + LATTICE_MODELS + PDE_MODELS,
+                              ExpiryType.AMERICAN.value:  [PricingModel.MC_GBM.value] + LATTICE_MODELS + PDE_MODELS
+                              + AMERICAN_APPROX_MODELS}
     , UdlType.FX.value:  {ExpiryType.EUROPEAN.value: [PricingModel.GK.value, PricingModel.MC_GBM.value
-                          , PricingModel.BINOMIAL.value],
-                          ExpiryType.AMERICAN.value:  [PricingModel.MC_GBM.value, PricingModel.BINOMIAL.value]}
+                          ] + LATTICE_MODELS + PDE_MODELS,
+                          ExpiryType.AMERICAN.value:  [PricingModel.MC_GBM.value] + LATTICE_MODELS + PDE_MODELS
+                          + AMERICAN_APPROX_MODELS}
     , UdlType.COMMODITY.value: {ExpiryType.EUROPEAN.value: [PricingModel.GK.value, PricingModel.MC_GBM.value
-                                , PricingModel.BINOMIAL.value],
-                                ExpiryType.AMERICAN.value: [PricingModel.MC_GBM.value, PricingModel.BINOMIAL.value]}
+                                ] + LATTICE_MODELS + PDE_MODELS,
+                                ExpiryType.AMERICAN.value: [PricingModel.MC_GBM.value] + LATTICE_MODELS + PDE_MODELS
+                                + AMERICAN_APPROX_MODELS}
     }
 
 DEFAULT_MODEL = {
@@ -106,7 +128,8 @@ DEFAULT_MODEL = {
 
 IV_MODELS = [PricingModel.BLACKSCHOLESMERTON.value, PricingModel.BLACK76.value, PricingModel.GK.value]
 
-ANALYTICAL_GREEKS = [PricingModel.BLACKSCHOLESMERTON.value, PricingModel.BLACK76.value, PricingModel.GK.value]
+ANALYTICAL_GREEKS = [PricingModel.BLACKSCHOLESMERTON.value, PricingModel.BLACK76.value, PricingModel.GK.value,
+                     PricingModel.MC_GBM.value] + LATTICE_MODELS + PDE_MODELS + AMERICAN_APPROX_MODELS
 
 from . import pricingmodels as pm
 
@@ -115,5 +138,11 @@ MODEL_MAPPER = {
     PricingModel.BLACK76.value: pm.B76,
     PricingModel.GK.value: pm.GK,
     PricingModel.MC_GBM.value: pm.MonteCarloGBM,
-    PricingModel.BINOMIAL.value: pm.BinomialModel
+    PricingModel.BINOMIAL.value: pm.BinomialModel,
+    PricingModel.BINOMIAL_BBS.value: pm.BinomialBBS,
+    PricingModel.BINOMIAL_BBSR.value: pm.BinomialBBSR,
+    PricingModel.TRINOMIAL.value: pm.TrinomialModel,
+    PricingModel.BARONE_ADESI_WHALEY.value: pm.BaroneAdesiWhaley,
+    PricingModel.BJERKSUND_STENSLAND.value: pm.BjerksundStensland,
+    PricingModel.FINITE_DIFFERENCE.value: pm.FiniteDifferenceModel
     }
@@ -8,7 +8,8 @@ from collections import Counter
 from datetime import timedelta
 from functools import partial
 
-from .namesnmapper import VanillaOptionType, ExpiryType, UdlType, RiskParameter
+from .namesnmapper import VanillaOptionType, ExpiryType, UdlType, RiskParameter, PricingModel
+from ..montecarlo.pathcache import PathCache
 
 from . import instruments as inst
 import platform
@@ -58,17 +59,37 @@ class OptionStr1Udl:
 
 
 class Engine:
+    """
+    Valuation and risk parameters of a strategy, every leg is priced by its own PricingEngine.
+    With the MC_GBM model the legs share a PathCache (path_cache argument, a new cache by default) and are
+    priced in this process, legs with the same dynamics then use one simulation.
+    help(.montecarlo.pathcache.PathCache)
+    """
 
     def __init__(self, instrument, option_portfolio, **kwargs):
+        if kwargs.get('model') == PricingModel.MC_GBM.value and kwargs.get('path_cache') is None:
+            kwargs['path_cache'] = PathCache()
         self._other_args = kwargs
         self.option_portfolio = option_portfolio
         self.instrument = instrument
 
+    @property
+    def path_cache(self):
+        return self._other_args.get('path_cache')
+
+    def _map(self, func, parameter):
+        if self.path_cache is not None:
+            return map(func, parameter)
+        return p_map(func, parameter)
+
+    def update(self, **market_kwargs):
+        self._other_args.update(market_kwargs)
+
     def weighted_valuation(self, option_detail):
         return option_detail[0].engine(**self._other_args).valuation() * option_detail[1]
 
     def valuation(self):
-        _valuations = p_map(self.weighted_valuation, self.option_portfolio)
+        _valuations = self._map(self.weighted_valuation, self.option_portfolio)
         return sum(_valuations)
 
     def weighted_risk_parameters(self, option_detail):
@@ -82,12 +103,12 @@ class Engine:
         return _risk_parameter * option_detail[1]
 
     def risk_parameter(self, var):
-        _risk_parameters = p_map(partial(self.risk_parameter_ind, risk_name=var), self.option_portfolio)
+        _risk_parameters = self._map(partial(self.risk_parameter_ind, risk_name=var), self.option_portfolio)
         return sum(_risk_parameters)
 
     def risk_parameters(self):
         str_risk_parameters = Counter()
-        _risk_parameters = p_map(self.weighted_risk_parameters, self.option_portfolio)
+        _risk_parameters = self._map(self.weighted_risk_parameters, self.option_portfolio)
         [str_risk_parameters.update(i) for i in _risk_parameters]
         return dict(str_risk_parameters)
 
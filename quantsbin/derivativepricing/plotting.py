@@ -8,9 +8,11 @@ import copy
 import matplotlib
 import matplotlib.pyplot as plt
 plt.style.use('ggplot')
-from .namesnmapper import UnderlyingParameters
+from .namesnmapper import UnderlyingParameters, RiskParameter
 from scipy.interpolate import interp1d
 
+GRID_FUNCS = ["valuation", RiskParameter.DELTA.value, RiskParameter.GAMMA.value, RiskParameter.THETA.value]
+
 
 class Plotting:
     """
@@ -38,20 +40,33 @@ class Plotting:
         return np.linspace(self.x_axis_range[0], self.x_axis_range[1], self.no_of_points)
 
     def _get_set(self, _x_var):
-        temp_object = copy.copy(self.object)
-        temp_object._other_args[self.x_axis] = _x_var
+        temp_object = copy.deepcopy(self.object)
+        temp_object.update(**{self.x_axis: _x_var})
         if self.func == "valuation":
             _fucntion_return = getattr(temp_object, self.func)()
         else:
             _fucntion_return = temp_object.risk_parameters_func()[self.func]()
         return _fucntion_return
 
+    def _grid_model(self):
+        """
+        Pricing model of the engine if it values all the spots of the graph from one grid solve
+        (e.g. FiniteDifferenceModel), otherwise None
+        """
+        _model = getattr(self.object, '_model_class', None)
+        if self.x_axis == UnderlyingParameters.SPOT.value and hasattr(_model, 'grid_values') and \
+                self.func in GRID_FUNCS and self.x_axis_range[1] < _model.spot_max:
+            return _model
+        return None
+
     def _y(self):
         if self.func == "payoff":
             return list(map(getattr(self.object, self.func), list(self._x())))
         elif self.func == "pnl":
             return np.array(list(map(getattr(self.object.instrument, "payoff"), list(self._x()))))\
                     - self.object.valuation()
+        elif self._grid_model() is not None:
+            return list(self._grid_model().grid_values(self._x(), self.func))
         else:
             return list(map(self._get_set, list(self._x())))
 
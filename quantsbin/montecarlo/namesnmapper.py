@@ -8,6 +8,7 @@ from enum import Enum
 
 class ProcessNames(Enum):
     GEOMETRICBROWNIANMOTION = 'GBM'
+    MULTIGEOMETRICBROWNIANMOTION = 'MultiGBM'
 
 
 class StimulationType(Enum):
@@ -15,8 +16,35 @@ class StimulationType(Enum):
     FINALVALUE = 'Final'
 
 
-from .stimulations import GeometricBrownianMotion
+class RandomSequence(Enum):
+    PSEUDO = 'Pseudo'
+    SOBOL = 'Sobol'
+
+
+class PathStorage(Enum):
+    FULL = 'Full'
+    LEAN = 'Lean'
+    MEMMAP = 'Memmap'
+
+
+class MultiAssetPayoff(Enum):
+    BASKET = 'Basket'
+    SPREAD = 'Spread'
+    BEST_OF = 'BestOf'
+    WORST_OF = 'WorstOf'
+
+
+from .stimulations import GeometricBrownianMotion, MultiGeometricBrownianMotion
+from .payoffs import basket_payoff, spread_payoff, best_of_payoff, worst_of_payoff
 
 mc_methd_mapper = {
-    ProcessNames.GEOMETRICBROWNIANMOTION.value: GeometricBrownianMotion
+    ProcessNames.GEOMETRICBROWNIANMOTION.value: GeometricBrownianMotion,
+    ProcessNames.MULTIGEOMETRICBROWNIANMOTION.value: MultiGeometricBrownianMotion
+}
+
+payoff_mapper = {
+    MultiAssetPayoff.BASKET.value: basket_payoff,
+    MultiAssetPayoff.SPREAD.value: spread_payoff,
+    MultiAssetPayoff.BEST_OF.value: best_of_payoff,
+    MultiAssetPayoff.WORST_OF.value: worst_of_payoff
 }
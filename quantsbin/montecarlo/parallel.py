@@ -0,0 +1,110 @@
+"""
+    developed by Quantsbin - Jun'18
+
+"""
+
+import multiprocessing
+
+
+def _worker_loop(connection, factory, args):
+    """
+    Runs in the worker process: builds the state object and calls its methods until None is received
+    """
+    try:
+        _state = factory(*args)
+    except Exception as _error:
+        _state = None
+        connection.send((False, _error))
+    else:
+        connection.send((True, None))
+    while True:
+        _message = connection.recv()
+        if _message is None:
+            break
+        _method, _args = _message
+        try:
+            connection.send((True, getattr(_state, _method)(*_args)))
+        except Exception as _error:
+            connection.send((False, _error))
+    connection.close()
+
+
+class WorkerPool:
+    """
+    Pool of persistent worker processes, each holding the state object factory(*args) for one entry of
+    args_list (e.g. the simulated paths of its chunks) between calls. Methods of the state objects are
+    called through map/call and results are returned in worker order, so reductions done by the caller
+    do not depend on which process finished first.
+    With processes=False the state objects are built in the calling process and called directly.
+        Args required:
+            factory = picklable callable (e.g. class defined at module level) building the state of a worker
+            args_list = (List of tuples) arguments of factory, one tuple per worker
+            processes = (Boolean) run every state object in its own process
+    """
+
+    def __init__(self, factory, args_list, processes=True):
+        self.processes = processes
+        self._connections = []
+        self._processes = []
+        self._states = []
+        if not processes:
+            self._states = [factory(*_args) for _args in args_list]
+            return
+        for _args in args_list:
+            _parent, _child = multiprocessing.Pipe()
+            _process = multiprocessing.Process(target=_worker_loop, args=(_child, factory, _args), daemon=True)
+            _process.start()
+            _child.close()
+            self._connections.append(_parent)
+            self._processes.append(_process)
+        try:
+            self._receive()
+        except Exception:
+            self.close()
+            raise
+
+    def __len__(self):
+        return len(self._connections) if self.processes else len(self._states)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _receive(self, connections=None):
+        _results = [_connection.recv() for _connection in (self._connections if connections is None else connections)]
+        for _ok, _result in _results:
+            if not _ok:
+                raise _result
+        return [_result for _ok, _result in _results]
+
+    def map(self, method, args_list):
+        """
+        Calls method on the first len(args_list) workers, worker i with the arguments args_list[i]
+        """
+        if not self.processes:
+            return [getattr(_state, method)(*_args) for _state, _args in zip(self._states, args_list)]
+        _connections = self._connections[:len(args_list)]
+        for _connection, _args in zip(_connections, args_list):
+            _connection.send((method, _args))
+        return self._receive(_connections)
+
+    def call(self, method, *args):
+        """
+        Calls method with the same arguments on every worker
+        """
+        return self.map(method, [args] * len(self))
+
+    def close(self):
+        for _connection in self._connections:
+            try:
+                _connection.send(None)
+                _connection.close()
+            except (OSError, EOFError):
+                pass
+        for _process in self._processes:
+            _process.join()
+        self._connections = []
+        self._processes = []
+        self._states = []
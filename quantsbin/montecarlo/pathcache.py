@@ -0,0 +1,73 @@
+"""
+    developed by Quantsbin - Jun'18
+
+"""
+
+from collections import OrderedDict, namedtuple
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'entries', 'nbytes', 'max_bytes'])
+
+
+class PathCache:
+    """
+    Least recently used cache of simulated paths shared by the simulations of instruments on the same
+    underlying (strategy legs, chains priced separately). Entries are keyed on everything that fixes the
+    paths: process, spot0, drift, volatility, maturity, steps, paths, seed, antithetic, random sequence,
+    dividend schedule, dtype and the chunk of paths. Cached arrays are read only. Least recently used entries are
+    evicted when the cached arrays use more than max_bytes, an array larger than max_bytes is not cached.
+        Args required:
+            max_bytes = (Integer) memory cap of the cached arrays e.g. 512 * 2 ** 20 for 512 MB
+    """
+
+    def __init__(self, max_bytes=512 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    #   entries are keyed on the dynamics, copies of engines and models (bumped greeks, plots) share the cache
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    @staticmethod
+    def key(stimulation, start, no_of_path):
+        """
+        Cache key of the paths start to start + no_of_path of a simulation
+        """
+        return (type(stimulation).__name__, stimulation.spot0, stimulation.drift, stimulation.volatility,
+                stimulation.maturity, stimulation.no_of_steps, stimulation.stimulation_type, stimulation.no_of_path,
+                stimulation._entropy, stimulation.antithetic, stimulation.random_sequence,
+                stimulation.no_of_replicates, tuple(tuple(_div) for _div in stimulation.div_list_processed),
+                stimulation.dtype.name, start, no_of_path)
+
+    def get(self, key, func):
+        """
+        Cached array of key, func() is called and its result cached on a miss
+        """
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        self.misses += 1
+        _value = func()
+        _value.flags.writeable = False
+        if _value.nbytes <= self.max_bytes:
+            self._entries[key] = _value
+            self.nbytes += _value.nbytes
+            while self.nbytes > self.max_bytes:
+                self.nbytes -= self._entries.popitem(last=False)[1].nbytes
+        return _value
+
+    def cache_info(self):
+        return CacheInfo(self.hits, self.misses, len(self._entries), self.nbytes, self.max_bytes)
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
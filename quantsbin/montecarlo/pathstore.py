@@ -0,0 +1,119 @@
+"""
+    developed by Quantsbin - Jun'18
+
+"""
+
+import json
+import os
+
+import numpy as np
+
+
+class PathStore:
+    """
+    Simulated paths kept out of core in a memory mapped file. The file is time major: row t holds the spots
+    of all the paths at step t (one row for final values), so a step of the backward induction or the final
+    spots of a chunk are one contiguous read. Chunks are stored one after the other in the columns, with
+    antithetic the paths of a chunk are followed by their mirrors exactly as stimulation_chunk returns them,
+    in the dtype of the simulation.
+    The parameters of the simulation are kept in <file_name>.json, a store whose parameters match the
+    simulation is reused as it is, otherwise it is simulated again chunk by chunk.
+        Args required:
+            file_name = (String) path of the data file e.g. "/data/paths/spx_20180531.dat"
+            metadata = (Dictionary) simulation parameters, chunks and layout of the file
+    """
+
+    def __init__(self, file_name, metadata):
+        self.file_name = file_name
+        self.metadata = metadata
+        self._offsets = {_start: (_offset, _rows) for _start, _offset, _rows in metadata['layout']}
+        self._array = None
+
+    def __getstate__(self):
+        _state = self.__dict__.copy()
+        _state['_array'] = None
+        return _state
+
+    @staticmethod
+    def simulation_metadata(stimulation, chunks):
+        """
+        JSON compatible parameters fixing the paths of a simulation split in chunks
+        """
+        return json.loads(json.dumps({
+            'process': type(stimulation).__name__, 'spot0': stimulation.spot0, 'maturity': stimulation.maturity,
+            'drift': stimulation.drift, 'volatility': stimulation.volatility,
+            'stimulation_type': stimulation.stimulation_type, 'no_of_path': stimulation.no_of_path,
+            'no_of_steps': stimulation.no_of_steps, 'entropy': stimulation._entropy,
+            'antithetic': stimulation.antithetic, 'random_sequence': stimulation.random_sequence,
+            'no_of_replicates': stimulation.no_of_replicates, 'stream_block_size': stimulation.stream_block_size,
+            'div_list_processed': [list(_div) for _div in stimulation.div_list_processed],
+            'dtype': stimulation.dtype.name,
+            'chunks': [list(_chunk) for _chunk in chunks]}))
+
+    @classmethod
+    def open_or_create(cls, file_name, stimulation, chunks):
+        """
+        Store of the simulation in file_name, reused when it was written for the same simulation
+        """
+        _simulation = cls.simulation_metadata(stimulation, chunks)
+        try:
+            with open(file_name + '.json') as _file:
+                _metadata = json.load(_file)
+            if _metadata['simulation'] == _simulation and os.path.exists(file_name):
+                return cls(file_name, _metadata)
+        except (OSError, ValueError, KeyError):
+            pass
+        return cls.create(file_name, stimulation, chunks)
+
+    @classmethod
+    def create(cls, file_name, stimulation, chunks):
+        """
+        Simulates the chunks one at a time into a new store, the metadata file is written last so an
+        interrupted store is never reused
+        """
+        _rows = stimulation.no_of_steps + 1 if stimulation._random_columns > 1 else 1
+        _mirrors = 2 if stimulation.antithetic else 1
+        _layout, _offset = [], 0
+        for _start, _no_of_path in chunks:
+            _layout.append([_start, _offset, _no_of_path * _mirrors])
+            _offset += _no_of_path * _mirrors
+        if os.path.exists(file_name + '.json'):
+            os.remove(file_name + '.json')
+        _array = np.memmap(file_name, dtype=stimulation.dtype, mode='w+', shape=(_rows, _offset))
+        for (_start, _no_of_path), (_, _column, _columns) in zip(chunks, _layout):
+            _array[:, _column:_column + _columns] = stimulation.stimulation_chunk(_start, _no_of_path).T
+        _array.flush()
+        del _array
+        _metadata = {'simulation': cls.simulation_metadata(stimulation, chunks), 'dtype': stimulation.dtype.name,
+                     'shape': [_rows, _offset], 'layout': _layout}
+        with open(file_name + '.json', 'w') as _file:
+            json.dump(_metadata, _file)
+        return cls(file_name, _metadata)
+
+    @property
+    def array(self):
+        """
+        Read only (steps+1 x paths) memory map of the store, opened once per process
+        """
+        if self._array is None:
+            self._array = np.memmap(self.file_name, dtype=self.metadata['dtype'], mode='r',
+                                    shape=tuple(self.metadata['shape']))
+        return self._array
+
+    def _columns(self, start):
+        _offset, _rows = self._offsets[start]
+        return slice(_offset, _offset + _rows)
+
+    def final_spots(self, start):
+        """
+        Final spots of the chunk starting at path start
+        """
+        return np.array(self.array[-1, self._columns(start)])
+
+    def path_slices(self, start):
+        """
+        Yields (step, spots of the chunk starting at path start) from the last step down to 0
+        """
+        _columns = self._columns(start)
+        for _step in range(self.array.shape[0] - 1, -1, -1):
+            yield _step, np.array(self.array[_step, _columns])
@@ -0,0 +1,37 @@
+"""
+    developed by Quantsbin - Jun'18
+
+"""
+
+import numpy as np
+
+
+#   payoffs of options on several assets, spots hold the assets in the last axis e.g. the (paths x assets) final
+#   values of MultiGeometricBrownianMotion or the last step of its paths, paths[:, -1]
+def basket_payoff(spots, strike, option_flag=1, weights=None):
+    """
+    Payoff of an option on the weighted sum of the assets, equally weighted by default
+    """
+    _weights = np.full(spots.shape[-1], 1.0 / spots.shape[-1]) if weights is None else np.asarray(weights, dtype=float)
+    return np.maximum(option_flag * (spots @ _weights - strike), 0.0)
+
+
+def spread_payoff(spots, strike, option_flag=1):
+    """
+    Payoff of an option on the first asset less the second one
+    """
+    return np.maximum(option_flag * (spots[..., 0] - spots[..., 1] - strike), 0.0)
+
+
+def best_of_payoff(spots, strike, option_flag=1):
+    """
+    Payoff of an option on the highest of the asset prices
+    """
+    return np.maximum(option_flag * (spots.max(axis=-1) - strike), 0.0)
+
+
+def worst_of_payoff(spots, strike, option_flag=1):
+    """
+    Payoff of an option on the lowest of the asset prices
+    """
+    return np.maximum(option_flag * (spots.min(axis=-1) - strike), 0.0)
@@ -0,0 +1,169 @@
+"""
+    developed by Quantsbin - Jun'18
+
+"""
+
+from math import sqrt
+
+import numpy as np
+
+
+class RunningStats:
+    """
+    Online mean and variance of a stream of samples. Every block of samples is merged into the running
+    values with the parallel form of Welford's algorithm (Chan et al.), so memory does not grow with the
+    number of samples and blocks (or partial results of other RunningStats) can be merged in any size.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def _merge(self, count, mean, m2):
+        if not count:
+            return
+        _total = self.count + count
+        _delta = mean - self.mean
+        self.mean += _delta * count / _total
+        self._m2 += m2 + (_delta ** 2) * self.count * count / _total
+        self.count = _total
+
+    def update(self, samples):
+        """
+        Adds a block (array) of samples
+        """
+        _samples = np.asarray(samples, dtype=float).ravel()
+        if _samples.size:
+            _mean = _samples.mean()
+            self._merge(_samples.size, _mean, float(np.sum((_samples - _mean) ** 2)))
+        return self
+
+    def merge(self, other):
+        """
+        Adds the samples summarised by another RunningStats
+        """
+        self._merge(other.count, other.mean, other._m2)
+        return self
+
+    @property
+    def variance(self):
+        if self.count < 2:
+            return float('nan')
+        return self._m2 / (self.count - 1)
+
+    @property
+    def std_error(self):
+        if self.count < 2:
+            return float('inf')
+        return sqrt(self.variance / self.count)
+
+    @property
+    def no_of_samples(self):
+        return self.count
+
+
+class ReplicateStats(RunningStats):
+    """
+    Mean and standard error of randomized quasi Monte Carlo: every merged RunningStats (one replicate) is a
+    single sample equal to its mean, no_of_samples counts the samples of all the replicates
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._no_of_samples = 0
+
+    def merge(self, other):
+        self._no_of_samples += other.count
+        return self.update([other.mean])
+
+    @property
+    def no_of_samples(self):
+        return self._no_of_samples
+
+
+class ControlVariateStats:
+    """
+    Online control variate estimate of the mean of samples y with controls x of known mean control_mean:
+    mean(y) - beta * (mean(x) - control_mean) where beta = cov(x, y) / var(x) is estimated from all the
+    samples merged so far. Means, variances and the covariance are merged like RunningStats.
+        Args required:
+            control_mean = (Float) exact expectation of the control e.g. closed form price
+    """
+
+    def __init__(self, control_mean):
+        self.control_mean = control_mean
+        self.count = 0
+        self.mean_y = 0.0
+        self.mean_x = 0.0
+        self._m2_y = 0.0
+        self._m2_x = 0.0
+        self._c_xy = 0.0
+
+    def _merge(self, count, mean_y, mean_x, m2_y, m2_x, c_xy):
+        if not count:
+            return
+        _total = self.count + count
+        _delta_y = mean_y - self.mean_y
+        _delta_x = mean_x - self.mean_x
+        _weight = self.count * count / _total
+        self.mean_y += _delta_y * count / _total
+        self.mean_x += _delta_x * count / _total
+        self._m2_y += m2_y + (_delta_y ** 2) * _weight
+        self._m2_x += m2_x + (_delta_x ** 2) * _weight
+        self._c_xy += c_xy + _delta_x * _delta_y * _weight
+        self.count = _total
+
+    def update(self, samples, controls):
+        """
+        Adds a block (array) of samples and the controls of the same paths
+        """
+        _y = np.asarray(samples, dtype=float).ravel()
+        _x = np.asarray(controls, dtype=float).ravel()
+        if _y.size:
+            _mean_y, _mean_x = _y.mean(), _x.mean()
+            self._merge(_y.size, _mean_y, _mean_x, float(np.sum((_y - _mean_y) ** 2)),
+                        float(np.sum((_x - _mean_x) ** 2)), float(np.sum((_x - _mean_x) * (_y - _mean_y))))
+        return self
+
+    def merge(self, other):
+        """
+        Adds the samples summarised by another ControlVariateStats
+        """
+        self._merge(other.count, other.mean_y, other.mean_x, other._m2_y, other._m2_x, other._c_xy)
+        return self
+
+    @property
+    def beta(self):
+        if self._m2_x <= 0:
+            return 0.0
+        return self._c_xy / self._m2_x
+
+    @property
+    def correlation(self):
+        if self._m2_x <= 0 or self._m2_y <= 0:
+            return float('nan')
+        return self._c_xy / sqrt(self._m2_x * self._m2_y)
+
+    @property
+    def mean(self):
+        return self.mean_y - self.beta * (self.mean_x - self.control_mean)
+
+    @property
+    def variance(self):
+        """
+        Variance of the residuals y - beta * x (one degree of freedom is used by beta)
+        """
+        if self.count < 3:
+            return float('nan')
+        return max(self._m2_y - self.beta * self._c_xy, 0.0) / (self.count - 2)
+
+    @property
+    def std_error(self):
+        if self.count < 3:
+            return float('inf')
+        return sqrt(self.variance / self.count)
+
+    @property
+    def no_of_samples(self):
+        return self.count
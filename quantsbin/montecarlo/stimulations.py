@@ -3,15 +3,62 @@
 
 """
 
+from math import ceil, log2
+
 import numpy as np
+from scipy.stats import norm, qmc
+
+from .namesnmapper import StimulationType, RandomSequence
+
 
-from .namesnmapper import StimulationType
+def brownian_bridge(normals):
+    """
+    Standard normal increments of the Brownian paths built from normals with the Brownian bridge: the first
+    column gives the final value, the next ones the midpoints of the coarser intervals (breadth first).
+    With Sobol points the best distributed coordinates thus set the large scale shape of the paths.
+    """
+    _no_of_steps = normals.shape[1]
+    _brownian = np.zeros((normals.shape[0], _no_of_steps + 1))
+    _brownian[:, -1] = np.sqrt(_no_of_steps) * normals[:, 0]
+    _intervals = [(0, _no_of_steps)]
+    _column = 1
+    while _intervals:
+        _left, _right = _intervals.pop(0)
+        if _right - _left < 2:
+            continue
+        _mid = (_left + _right) // 2
+        _weight = (_mid - _left) / (_right - _left)
+        _brownian[:, _mid] = (1 - _weight) * _brownian[:, _left] + _weight * _brownian[:, _right] + \
+            np.sqrt((_mid - _left) * (1 - _weight)) * normals[:, _column]
+        _column += 1
+        _intervals += [(_left, _mid), (_mid, _right)]
+    return np.diff(_brownian, axis=1)
 
 
 class GeometricBrownianMotion:
+    """
+    Geometric Brownian motion paths (or final values) of one underlying with discrete dividends.
+    Random numbers come from independent np.random.Generator substreams of SeedSequence(seed): paths are
+    split into blocks of stream_block_size paths and block b uses the substream with spawn_key (b,) for final
+    values and (b, step) for every step of full paths (the keys SeedSequence(seed).spawn would give).
+    Any block, chunk or step can therefore be generated on its own, in any order or process, and a simulation
+    gives the same paths whether it is run in one go, in chunks or split across workers.
+    With random_sequence Sobol the paths are no_of_replicates independently scrambled Sobol point sets
+    (randomized QMC) of replicate_size paths each, replicate r scrambled with the substream (r,). Normals are
+    the inverse normal of the points, full paths are built with the Brownian bridge. Every replicate is one
+    chunk and no_of_path is rounded up so that replicate_size is a power of 2.
+    With a path_cache (montecarlo.pathcache.PathCache) simulated chunks are looked up in and added to the
+    cache, simulations with the same dynamics then share their paths.
+    Normals are drawn straight into one buffer and the spots are computed in place in one output buffer of
+    dtype (np.float32 halves the memory traffic, default np.float64). Antithetic mirrors are evaluated from
+    the negated normals written into the output, the normals themselves are not duplicated.
+    """
+    stream_block_size = 16384
+
     def __init__(self, spot0, maturity, drift=0.0, volatility=0.1, stimulation_type=StimulationType.FINALVALUE,
                  no_of_path=10000, no_of_steps=100, seed=None, antithetic=False, random_array=None,
-                 div_list_processed=None, **kwargs):
+                 div_list_processed=None, random_sequence=RandomSequence.PSEUDO.value, no_of_replicates=16,
+                 path_cache=None, dtype=np.float64, **kwargs):
         self.spot0 = spot0
         self.maturity = maturity
         self.drift = drift
@@ -20,56 +67,334 @@ class GeometricBrownianMotion:
         self.no_of_path = no_of_path
         self.no_of_steps = no_of_steps
         self.seed = seed
+        self._entropy = np.random.SeedSequence(seed).entropy
         self.antithetic = antithetic
         self.random_array = random_array
-        self.div_list_processed = div_list_processed
+        self.div_list_processed = div_list_processed or []
+        self.random_sequence = random_sequence
+        self.no_of_replicates = no_of_replicates
+        self.path_cache = path_cache
+        self.dtype = np.dtype(dtype)
+        if self.quasi_random:
+            self.replicate_size = 2 ** int(ceil(log2(max(ceil(no_of_path / no_of_replicates), 1))))
+            self.no_of_path = self.replicate_size * no_of_replicates
+
+    @property
+    def quasi_random(self):
+        return self.random_sequence == RandomSequence.SOBOL.value and self.random_array is None
 
     @property
     def delta_maturity(self):
         return self.maturity / self.no_of_steps
 
+    @property
+    def _random_columns(self):
+        if self.stimulation_type == StimulationType.FINALVALUE.value:
+            return 1
+        return self.no_of_steps
+
+    def expected_final_value(self):
+        """
+        Expectation of the simulated final value (dividends as simulated by the paths)
+        """
+        _expected = self.spot0 * np.exp(self.drift * self.maturity)
+        for _step, _amount in self.step_dividends().items():
+            _expected -= _amount * np.exp(self.drift * self.delta_maturity * (self.no_of_steps - _step))
+        return _expected
+
+    def random_stream(self, *spawn_key):
+        """
+        Generator of the substream spawn_key e.g. (block,) or (block, step)
+        """
+        return np.random.Generator(np.random.PCG64(np.random.SeedSequence(self._entropy, spawn_key=spawn_key)))
+
+    def _sobol_normals(self, replicate):
+        _points = qmc.Sobol(self._random_columns, scramble=True, seed=self.random_stream(replicate)).random_base2(
+            int(log2(self.replicate_size)))
+        _normals = norm.ppf(np.clip(_points, 1e-15, 1 - 1e-15))
+        if self.stimulation_type == StimulationType.FULLPATH.value:
+            _normals = brownian_bridge(_normals)
+        return _normals.astype(self.dtype, copy=False)
+
+    def _step_normals(self, start, no_of_path, step, out=None):
+        """
+        Normals of one step (step None for final values) of the paths start to start + no_of_path drawn from
+        the pseudo random substreams into out
+        """
+        _normals = np.empty(no_of_path, dtype=self.dtype) if out is None else out
+        for _offset in range(0, no_of_path, self.stream_block_size):
+            _block = (start + _offset) // self.stream_block_size
+            _stream = self.random_stream(_block) if step is None else self.random_stream(_block, step)
+            _stream.standard_normal(dtype=self.dtype,
+                                    out=_normals[_offset:_offset + min(self.stream_block_size, no_of_path - _offset)])
+        return _normals
+
+    def _draw_normals(self, start, no_of_path):
+        """
+        Normals of the paths start to start + no_of_path, start is a multiple of stream_block_size
+        (of replicate_size for Sobol)
+        """
+        if self.quasi_random:
+            _first = start // self.replicate_size
+            return np.vstack([self._sobol_normals(_replicate) for _replicate in
+                              range(_first, _first + int(ceil(no_of_path / self.replicate_size)))])[:no_of_path]
+        if self.stimulation_type == StimulationType.FULLPATH.value:
+            _normals = np.empty((self.no_of_steps, no_of_path), dtype=self.dtype)
+            for _step in range(self.no_of_steps):
+                self._step_normals(start, no_of_path, _step, out=_normals[_step])
+            return _normals.T
+        _normals = np.empty((no_of_path, 1), dtype=self.dtype)
+        self._step_normals(start, no_of_path, None, out=_normals[:, 0])
+        return _normals
+
+    def _check_random_array(self):
+        if self.stimulation_type == StimulationType.FINALVALUE.value:
+            assert (self.random_array.shape == (self.no_of_path, 1)), "Incorrect dimension of random array"
+        if self.stimulation_type == StimulationType.FULLPATH.value:
+            assert (self.random_array.shape == (self.no_of_path, self.no_of_steps)), "Incorrect dimension of array"
+
     @property
     def norm_random(self):
-        if self.random_array:
-            if self.stimulation_type == StimulationType.FINALVALUE.value:
-                assert (self.random_array.shape == (self.no_of_path, 1)), "Incorrect dimension of random array"
-            if self.stimulation_type == StimulationType.FULLPATH.value:
-                assert (self.random_array.shape == (self.no_of_path, self.no_of_steps)), "Incorrect dimension of array"
+        if self.random_array is not None:
+            self._check_random_array()
             __norm_random = self.random_array
         else:
-            np.random.seed(self.seed)
-            if self.stimulation_type == StimulationType.FINALVALUE.value:
-                __norm_random = np.random.normal(size=(self.no_of_path, 1))
-            else:
-                __norm_random = np.random.normal(size=(self.no_of_path, self.no_of_steps))
+            __norm_random = self._draw_normals(0, self.no_of_path)
 
         if self.antithetic:
             __norm_random = np.vstack((__norm_random, __norm_random * -1))
 
         return __norm_random
 
-    def _stimulate_final(self):
-        return (self.spot0 * np.exp((self.drift - (self.volatility ** 2) / 2) * self.maturity
-                                    + self.volatility * np.sqrt(self.maturity) * self.norm_random))
-
-    def _stimulate_path(self):
-        __exp_term = ((self.drift - (self.volatility ** 2) / 2) * self.delta_maturity) + \
-                     (self.volatility * np.sqrt(self.delta_maturity) * self.norm_random)
-        __cum_exp_term = np.exp(np.cumsum(__exp_term, axis=1))
+    def _output(self, norm_random, columns):
+        """
+        Output buffer of the spots with the volatility term of the normals (and of their mirrors with antithetic)
+        written in its last columns
+        """
+        _rows = norm_random.shape[0]
+        _output = np.empty((_rows * (2 if self.antithetic else 1), columns), dtype=self.dtype)
+        _scale = self.volatility * np.sqrt(self.maturity if columns == 1 else self.delta_maturity)
+        np.multiply(norm_random, _scale, out=_output[:_rows, columns - norm_random.shape[1]:])
         if self.antithetic:
-            __paths = self.no_of_path * 2
-        else:
-            __paths = self.no_of_path
-        __final_term = np.hstack((np.ones((__paths, 1)), __cum_exp_term))
-        _stimulated_spot = self.spot0 * __final_term
+            np.negative(_output[:_rows, columns - norm_random.shape[1]:],
+                        out=_output[_rows:, columns - norm_random.shape[1]:])
+        return _output
+
+    def _stimulate_final(self, norm_random):
+        _stimulated_spot = self._output(norm_random, 1)
+        _stimulated_spot += (self.drift - (self.volatility ** 2) / 2) * self.maturity
+        np.exp(_stimulated_spot, out=_stimulated_spot)
+        _stimulated_spot *= self.spot0
+        return _stimulated_spot
+
+    def step_dividends(self):
+        """
+        Dividend amount paid at every step, a dividend is paid at step int(time/delta_maturity) and taken out
+        of the spot before it grows to the next step. Dividends of the last step (paid on the expiry date) are
+        not simulated, the paths, their expectation and the lean sweep all use these steps
+        """
+        _dividends = {}
         for div in self.div_list_processed:
             _temp_n = int(div[0]/self.delta_maturity)
-            _temp_cum_exp_term = div[1]*np.exp(np.cumsum(__exp_term[:, _temp_n:], axis=1))
-            _stimulated_spot[:, _temp_n+1:] = _stimulated_spot[:, _temp_n+1:] - _temp_cum_exp_term
+            if _temp_n < self.no_of_steps:
+                _dividends[_temp_n] = _dividends.get(_temp_n, 0) + div[1]
+        return _dividends
+
+    def _stimulate_path(self, norm_random):
+        """
+        Spots of the paths in one forward sweep over the output: the log increments are written in place of
+        the spots, then between two dividend steps n < m the spots are S(n+1..m) = (S(n) - D(n)) * exp(cumsum
+        of the increments), so every dividend costs one column operation
+        """
+        _stimulated_spot = self._output(norm_random, self.no_of_steps + 1)
+        _stimulated_spot[:, 0] = self.spot0
+        _stimulated_spot[:, 1:] += (self.drift - (self.volatility ** 2) / 2) * self.delta_maturity
+        _dividends = self.step_dividends()
+        _bounds = sorted(_dividends) + [self.no_of_steps]
+        _start = 0
+        for _end in _bounds:
+            if _end == _start:
+                continue
+            _segment = _stimulated_spot[:, _start + 1:_end + 1]
+            np.cumsum(_segment, axis=1, out=_segment)
+            np.exp(_segment, out=_segment)
+            _segment *= (_stimulated_spot[:, _start] - _dividends.get(_start, 0))[:, np.newaxis]
+            _start = _end
         return _stimulated_spot
 
-    def stimulation(self):
+    def _stimulate(self, norm_random):
         if self.stimulation_type == StimulationType.FINALVALUE.value:
-            return self._stimulate_final()
+            return self._stimulate_final(norm_random)
         elif self.stimulation_type == StimulationType.FULLPATH.value:
-            return self._stimulate_path()
+            return self._stimulate_path(norm_random)
+
+    def stimulation(self):
+        if self.random_array is None:
+            return self.stimulation_chunk(0, self.no_of_path)
+        self._check_random_array()
+        return self._stimulate(self.random_array)
+
+    def chunk_starts(self, chunk_size):
+        """
+        First path of every chunk, chunk_size is rounded up to a multiple of stream_block_size
+        (with Sobol every replicate is a chunk and chunk_size is not used)
+        """
+        if self.quasi_random:
+            return list(range(0, self.no_of_path, self.replicate_size)), self.replicate_size
+        _chunk_size = -(-chunk_size // self.stream_block_size) * self.stream_block_size
+        return list(range(0, self.no_of_path, _chunk_size)), _chunk_size
+
+    def stimulation_chunk(self, start, no_of_path):
+        """
+        Simulation of the paths start to start + no_of_path (followed by their mirrors with antithetic)
+        """
+        if self.path_cache is not None and self.random_array is None:
+            return self.path_cache.get(self.path_cache.key(self, start, no_of_path),
+                                       lambda: self._stimulate(self._chunk_normals(start, no_of_path)))
+        return self._stimulate(self._chunk_normals(start, no_of_path))
+
+    def _chunk_normals(self, start, no_of_path):
+        if self.random_array is None:
+            return self._draw_normals(start, no_of_path)
+        return self.random_array[start:start + no_of_path]
+
+    def _log_increment(self, start, no_of_path, step):
+        _normals = self._step_normals(start, no_of_path, step)
+        if self.antithetic:
+            _normals = np.concatenate((_normals, _normals * -1))
+        return ((self.drift - (self.volatility ** 2) / 2) * self.delta_maturity) + \
+            (self.volatility * np.sqrt(self.delta_maturity) * _normals)
+
+    def _lean_path_slices(self, start, no_of_path):
+        _dividends = self.step_dividends()
+        _log_spot = np.zeros(no_of_path * (2 if self.antithetic else 1))
+        _div_log_spot = {}
+        for _step in range(self.no_of_steps):
+            if _step in _dividends:
+                _div_log_spot[_step] = _log_spot.copy()
+            _log_spot += self._log_increment(start, no_of_path, _step)
+        _adj_spot = self.spot0 - sum(_amount * np.exp(-_div_log_spot[_step]) for _step, _amount in _dividends.items())
+        for _step in range(self.no_of_steps, -1, -1):
+            if _step in _dividends:
+                _adj_spot = _adj_spot + _dividends[_step] * np.exp(-_div_log_spot[_step])
+            yield _step, np.exp(_log_spot) * _adj_spot
+            if _step:
+                _log_spot -= self._log_increment(start, no_of_path, _step - 1)
+
+    def path_slices(self, start, no_of_path, lean=True):
+        """
+        Yields (step, spots of the paths at step) from no_of_steps down to 0 for the paths of
+        stimulation_chunk(start, no_of_path). With lean only the log spot of every path (and its value at the
+        dividend steps) is kept: normals of a step are drawn again from their substream on the way back,
+        S(t) = exp(X(t)) * (spot0 - sum of dividends paid before t times exp(-X(dividend step))).
+        Sobol and random_array paths, and paths shared through a path_cache, are always simulated in full.
+        """
+        if lean and not self.quasi_random and self.random_array is None and self.path_cache is None:
+            return self._lean_path_slices(start, no_of_path)
+        _paths = self.stimulation_chunk(start, no_of_path)
+        return ((_step, _paths[:, _step]) for _step in range(self.no_of_steps, -1, -1))
+
+    def stimulation_chunks(self, chunk_size):
+        """
+        Generates the simulation in chunks of chunk_size paths (rounded up to a multiple of stream_block_size),
+        only one chunk of normals and paths is in memory at a time. With antithetic every chunk holds its
+        paths followed by their mirrors. The chunks together are the same paths as stimulation().
+        """
+        _starts, _chunk_size = self.chunk_starts(chunk_size)
+        for _start in _starts:
+            yield self.stimulation_chunk(_start, min(_chunk_size, self.no_of_path - _start))
+
+
+class MultiGeometricBrownianMotion(GeometricBrownianMotion):
+    """
+    Correlated geometric Brownian motion paths (or final values) of several underlyings. The correlation matrix
+    is factorised once (Cholesky), every block of independent normals drawn from the substreams of
+    GeometricBrownianMotion, (paths x assets) per step, is correlated and scaled by the volatilities with one
+    batched matrix product. Simulations are (paths x assets) arrays for final values and
+    (paths x steps+1 x assets) arrays for full paths, followed by their mirrors with antithetic.
+    Discrete dividends, Sobol sequences and path caches are not available.
+        Args required:
+            spot0 = (List of Float) spot of every asset e.g. [100.0, 95.0]
+            maturity = (Float) e.g. 0.5
+            drift = (Float or list of Float) drift of every asset e.g. [0.05, 0.03]
+            volatility = (Float or list of Float) volatility of every asset e.g. [0.25, 0.3]
+            correlation = (Matrix) positive definite correlation matrix of the assets e.g. [[1, 0.5], [0.5, 1]].
+                          Default uncorrelated
+            Other arguments same as GeometricBrownianMotion
+    """
+
+    def __init__(self, spot0, maturity, drift=0.0, volatility=0.1, correlation=None,
+                 stimulation_type=StimulationType.FINALVALUE.value, no_of_path=10000, no_of_steps=100, seed=None,
+                 antithetic=False, random_array=None, div_list_processed=None,
+                 random_sequence=RandomSequence.PSEUDO.value, path_cache=None, dtype=np.float64, **kwargs):
+        if div_list_processed:
+            raise ValueError("Discrete dividends are not available for multi asset simulation")
+        if random_sequence != RandomSequence.PSEUDO.value:
+            raise ValueError("Only pseudo random sequences are available for multi asset simulation")
+        if path_cache is not None:
+            raise ValueError("Path cache is not available for multi asset simulation")
+        super().__init__(spot0, maturity, drift=drift, volatility=volatility, stimulation_type=stimulation_type,
+                         no_of_path=no_of_path, no_of_steps=no_of_steps, seed=seed, antithetic=antithetic,
+                         random_array=random_array, dtype=dtype)
+        self.spot0 = np.asarray(spot0, dtype=float)
+        self.no_of_assets = len(self.spot0)
+        self.drift = np.broadcast_to(np.asarray(drift, dtype=float), self.spot0.shape)
+        self.volatility = np.broadcast_to(np.asarray(volatility, dtype=float), self.spot0.shape)
+        self.correlation = np.eye(self.no_of_assets) if correlation is None else np.asarray(correlation, dtype=float)
+        if self.correlation.shape != (self.no_of_assets, self.no_of_assets):
+            raise ValueError("Correlation matrix should be of size no of assets x no of assets")
+        try:
+            self.cholesky = np.linalg.cholesky(self.correlation)
+        except np.linalg.LinAlgError:
+            raise ValueError("Correlation matrix should be positive definite")
+        #   rows of the Cholesky factor scaled by the volatility of their asset
+        self._volatility_factor = self.volatility[:, np.newaxis] * self.cholesky
+
+    def expected_final_value(self):
+        return self.spot0 * np.exp(self.drift * self.maturity)
+
+    def _draw_normals(self, start, no_of_path):
+        """
+        Independent normals of the paths start to start + no_of_path, (paths x assets) for final values and
+        (paths x steps x assets) for full paths (time major in memory)
+        """
+        if self.stimulation_type == StimulationType.FULLPATH.value:
+            _normals = np.empty((self.no_of_steps, no_of_path, self.no_of_assets), dtype=self.dtype)
+            for _step in range(self.no_of_steps):
+                self._step_normals(start, no_of_path, _step, out=_normals[_step])
+            return _normals.transpose(1, 0, 2)
+        return self._step_normals(start, no_of_path, None,
+                                  out=np.empty((no_of_path, self.no_of_assets), dtype=self.dtype))
+
+    def _check_random_array(self):
+        if self.stimulation_type == StimulationType.FINALVALUE.value:
+            assert (self.random_array.shape == (self.no_of_path, self.no_of_assets)), \
+                "Incorrect dimension of random array"
+        if self.stimulation_type == StimulationType.FULLPATH.value:
+            assert (self.random_array.shape == (self.no_of_path, self.no_of_steps, self.no_of_assets)), \
+                "Incorrect dimension of array"
+
+    def _stimulate(self, norm_random):
+        _final = self.stimulation_type == StimulationType.FINALVALUE.value
+        _delta_maturity = self.maturity if _final else self.delta_maturity
+        _rows = norm_random.shape[0]
+        _shape = (self.no_of_assets,) if _final else (self.no_of_steps + 1, self.no_of_assets)
+        _stimulated_spot = np.empty((_rows * (2 if self.antithetic else 1),) + _shape, dtype=self.dtype)
+        _log_increment = _stimulated_spot if _final else _stimulated_spot[:, 1:]
+        np.matmul(norm_random, (self._volatility_factor.T * np.sqrt(_delta_maturity)).astype(self.dtype),
+                  out=_log_increment[:_rows])
+        if self.antithetic:
+            np.negative(_log_increment[:_rows], out=_log_increment[_rows:])
+        _log_increment += ((self.drift - (self.volatility ** 2) / 2) * _delta_maturity).astype(self.dtype)
+        if not _final:
+            _stimulated_spot[:, 0] = 0
+            np.cumsum(_stimulated_spot, axis=1, out=_stimulated_spot)
+        np.exp(_stimulated_spot, out=_stimulated_spot)
+        _stimulated_spot *= self.spot0.astype(self.dtype)
+        return _stimulated_spot
+
+    def path_slices(self, start, no_of_path, lean=True):
+        """
+        Yields (step, (paths x assets) spots at step) from no_of_steps down to 0, paths are always simulated in full
+        """
+        return super().path_slices(start, no_of_path, lean=False)
@@ -2,10 +2,23 @@
     developed by Quantsbin - Jun'18
 
 """
+import os
+import tempfile
 import unittest
+from unittest import mock
+import numpy as np
+from scipy.stats import norm
+from scipy.optimize import brentq
 import quantsbin.derivativepricing as qbdp
 
 from quantsbin.derivativepricing.namesnmapper import VanillaOptionType, ExpiryType, UdlType, OBJECT_MODEL, DerivativeType
+from quantsbin.derivativepricing.helperfn import market_cached
+from quantsbin.derivativepricing.pricingmodels import Model, BSM, B76, BSMFrameworkBatch, BinomialModel, BinomialBBS, \
+    BinomialBBSR, TrinomialModel, MonteCarloGBM
+from quantsbin.montecarlo.pathcache import PathCache
+from quantsbin.montecarlo.namesnmapper import mc_methd_mapper, payoff_mapper
+from quantsbin.montecarlo.stimulations import GeometricBrownianMotion
+from quantsbin.montecarlo.pathstore import PathStore
 
 
 Input = {'equityInst': {'option_type': 'Call',
@@ -139,6 +152,688 @@ class Test_comOption(unittest.TestCase):
         else:
             self.fail("Invalid Model")
 
+class Test_batchPricing(unittest.TestCase):
+    def setUp(self):
+        self.strikes = [90, 100, 110]
+        self.option_types = ['Call', 'Put', 'Put']
+        self.engines = [qbdp.EqOption(option_type=option_type, strike=strike, expiry_date='20180630')
+                        .engine(model='BSM', spot0=110, pricing_date='20180531', volatility=0.25,
+                                rf_rate=0.05, yield_div=0.01)
+                        for strike, option_type in zip(self.strikes, self.option_types)]
+
+    def test(self):
+        premium, risk_parameters = BSM.price_batch(spot0=110, strike=self.strikes, maturity=30/365.0,
+                                                   volatility=0.25, rf_rate=0.05, cnv_yield=0.01,
+                                                   option_type=self.option_types)
+        for i, engine in enumerate(self.engines):
+            self.assertAlmostEqual(premium[i], engine.valuation(), places=8)
+            for name, value in engine.risk_parameters().items():
+                self.assertAlmostEqual(risk_parameters[name][i], value, places=8)
+
+
+class Test_impliedVolatility(unittest.TestCase):
+    def setUp(self):
+        self.fut_option_engine = qbdp.FutOption(**dict(Input['futuresInst'], strike=108)).engine(**Input['futuresEng'])
+
+    def test(self):
+        volatility = [0.05, 0.25, 1.5]
+        premium, _ = B76.price_batch(spot0=110, strike=108, maturity=30/365.0, volatility=volatility, rf_rate=0.05)
+        implied = self.fut_option_engine.imply_volatility(premium, full_output=True)
+        self.assertTrue(implied.converged.all())
+        for i, vol in enumerate(volatility):
+            self.assertAlmostEqual(implied.volatility[i], vol, places=6)
+        self.assertAlmostEqual(self.fut_option_engine.imply_volatility(premium[2]), 1.5, places=6)
+
+
+class Test_marketCache(unittest.TestCase):
+    class CountingModel(Model):
+        def __init__(self, spot0, volatility):
+            self.spot0 = spot0
+            self.volatility = volatility
+            self.calls = []
+
+        @market_cached
+        def variance(self):
+            self.calls.append(self.volatility)
+            return (self.spot0 * self.volatility) ** 2
+
+        def valuation(self):
+            return self.variance
+
+        def risk_parameters(self):
+            return {}
+
+    def test(self):
+        model = self.CountingModel(100, 0.2)
+        self.assertEqual([model.valuation(), model.variance], [400.0, 400.0])
+        self.assertEqual(model.calls, [0.2])
+        model.volatility = 0.3
+        self.assertAlmostEqual(model.valuation(), 900.0)
+        self.assertEqual(model.calls, [0.2, 0.3])
+        model.update(spot0=200)
+        self.assertAlmostEqual(model.variance, 3600.0)
+        model.valuation()
+        self.assertEqual(model.calls, [0.2, 0.3, 0.3])
+
+    def test_bsm(self):
+        eq_option = qbdp.EqOption(**Input['equityInst'])
+        market_kwargs = {'spot0': 110, 'rf_rate': 0.05, 'volatility': 0.25, 'pricing_date': '20180531'}
+        model = BSM(eq_option, **market_kwargs)
+        d1 = model.d1
+        self.assertIs(model.d1, d1)
+        model.volatility = 0.3
+        self.assertEqual(model.d1, BSM(eq_option, **dict(market_kwargs, volatility=0.3)).d1)
+        self.assertNotEqual(model.d1, d1)
+
+
+class Test_engineUpdate(unittest.TestCase):
+    def setUp(self):
+        self.eq_option = qbdp.EqOption(option_type='Put', strike=100, expiry_date='20181231', expiry_type='American')
+        self.market_kwargs = {'spot0': 100, 'rf_rate': 0.05, 'yield_div': 0.01, 'volatility': 0.25,
+                              'pricing_date': '20180531', 'div_list': [('20180915', 1.0)]}
+        self.models = {'Binomial': {'no_of_steps': 100}, 'Trinomial': {'no_of_steps': 50},
+                       'FD_CN': {'no_of_steps': 50}, 'BAW': {},
+                       'MC_GBM': {'no_of_path': 2000, 'no_of_steps': 20, 'seed': 3}}
+
+    def test(self):
+        changes = [{'spot0': 104}, {'div_list': [('20180801', 0.5), ('20181101', 1.5)]},
+                   {'pricing_date': '20180701'}, {'spot0': 97, 'pricing_date': '20180615', 'div_list': None}]
+        for model, model_kwargs in self.models.items():
+            engine = self.eq_option.engine(model=model, **dict(self.market_kwargs, **model_kwargs))
+            engine.valuation()
+            for change in changes:
+                engine.update(**change)
+                self.market_kwargs.update(change)
+                fresh_engine = self.eq_option.engine(model=model, **dict(self.market_kwargs, **model_kwargs))
+                self.assertAlmostEqual(engine.valuation(), fresh_engine.valuation(), places=12, msg=model)
+        bsm_option = qbdp.EqOption(option_type='Put', strike=100, expiry_date='20181231')
+        engine = bsm_option.engine(model='BSM', **self.market_kwargs)
+        engine.update(div_list=[('20180801', 2.0)])
+        self.assertAlmostEqual(engine.valuation(), bsm_option.engine(
+            model='BSM', **dict(self.market_kwargs, div_list=[('20180801', 2.0)])).valuation(), places=12)
+
+    def test_unknown_parameter(self):
+        engine = qbdp.EqOption(option_type='Put', strike=100, expiry_date='20181231').engine(
+            model='BSM', **self.market_kwargs)
+        premium = engine.valuation()
+        with self.assertRaises(AttributeError):
+            engine.update(spot0=110, fwd0=110)
+        with self.assertRaises(AttributeError):
+            engine.update(no_of_steps=100)
+        self.assertEqual(engine.valuation(), premium)
+        self.assertEqual(engine._other_args['spot0'], 100)
+
+    def test_instrument_arguments(self):
+        updates = [(qbdp.EqOption(option_type='Put', strike=100, expiry_date='20181231'), 'BSM',
+                    Input['equityEng'], {'yield_div': 0.03}),
+                   (qbdp.FutOption(**Input['futuresInst']), 'B76', Input['futuresEng'],
+                    {'fwd0': 104, 'rf_rate': 0.02}),
+                   (qbdp.FXOption(**Input['fxInst']), 'GK', Input['fxEng'],
+                    {'rf_rate_local': 0.02, 'rf_rate_foreign': 0.04})]
+        for option, model, market_kwargs, change in updates:
+            market_kwargs = {_name: _value for _name, _value in market_kwargs.items() if _name != 'model'}
+            engine = option.engine(model=model, **market_kwargs)
+            engine.valuation()
+            engine.update(**change)
+            fresh_engine = option.engine(model=model, **dict(market_kwargs, **change))
+            self.assertAlmostEqual(engine.valuation(), fresh_engine.valuation(), places=12, msg=model)
+            self.assertEqual(engine.risk_parameters(), fresh_engine.risk_parameters(), msg=model)
+        engine = qbdp.FutOption(**Input['futuresInst']).engine(**Input['futuresEng'])
+        engine.update(pricing_date='20180601')
+        self.assertIsNone(engine._model_class.update_target('div_processed'))
+
+    def test_market_fields_not_used(self):
+        market = qbdp.MarketEnvironment(spot0=110, rf_rate=0.05, volatility=0.25, pricing_date='20180531')
+        engine = qbdp.FutOption(**dict(Input['futuresInst'], strike=108)).engine(model='B76', market=market)
+        premium = engine.valuation()
+        market.div_list = [('20180615', 1.0)]
+        self.assertEqual(engine.valuation(), premium)
+        market.spot0 = 111
+        self.assertNotEqual(engine.valuation(), premium)
+
+
+class Test_impliedVolTracker(unittest.TestCase):
+    def setUp(self):
+        self.eq_option = qbdp.EqOption(option_type='Put', strike=105, expiry_date='20181231')
+        self.market_kwargs = {'spot0': 100, 'pricing_date': '20180531', 'rf_rate': 0.05, 'yield_div': 0.01}
+        self.engine = self.eq_option.engine(model='BSM', volatility=0.2, **self.market_kwargs)
+        self.tracker = qbdp.ImpliedVolTracker(tolerance=1e-6)
+
+    def premium(self, volatility):
+        return self.eq_option.engine(model='BSM', volatility=volatility, **self.market_kwargs).valuation()
+
+    def brute_force_vol(self, premium):
+        return brentq(lambda volatility: self.premium(volatility) - premium, 0.01, 2, xtol=1e-14)
+
+    def track(self, premium):
+        solver = BSMFrameworkBatch.imply_volatility
+        with mock.patch.object(BSMFrameworkBatch, 'imply_volatility', autospec=True, side_effect=solver) as solve:
+            volatility = self.tracker.imply_volatility(self.engine, premium)
+        self.assertAlmostEqual(volatility, self.brute_force_vol(premium), places=7)
+        return volatility, solve.call_args_list
+
+    def test(self):
+        #   cold start solves from scratch
+        volatility, calls = self.track(self.premium(0.25))
+        self.assertEqual(len(calls), 1)
+        self.assertNotIn('vol_guess', calls[0][1])
+        #   unchanged quote is within tolerance of the stored solution
+        self.assertEqual(self.track(self.premium(0.25)), (volatility, []))
+        #   small move is taken from the vega linearised estimate
+        linearised, calls = self.track(self.premium(0.2501))
+        self.assertEqual(calls, [])
+        self.assertNotEqual(linearised, volatility)
+        #   large move warm starts the solver from the linearised estimate
+        _, calls = self.track(self.premium(0.4))
+        self.assertEqual(len(calls), 1)
+        self.assertGreater(calls[0][1]['vol_guess'], 0.2501)
+
+    def test_reset(self):
+        self.track(self.premium(0.25))
+        for instrument in (self.eq_option, None):
+            self.tracker.reset(instrument)
+            _, calls = self.track(self.premium(0.25))
+            self.assertEqual(len(calls), 1)
+            self.assertNotIn('vol_guess', calls[0][1])
+
+
+class Test_marketEnvironment(unittest.TestCase):
+    def setUp(self):
+        self.market = qbdp.MarketEnvironment(spot0=110, rf_rate=0.05, cnv_yield=0.01, volatility=0.25,
+                                             pricing_date='20180531', div_list=[('20180615', 1.0)])
+        self.eq_option = qbdp.EqOption(**Input['equityInst'])
+        self.eq_option_engine = self.eq_option.engine(model='BSM', market=self.market)
+
+    def test(self):
+        market_kwargs = {'spot0': 110, 'rf_rate': 0.05, 'yield_div': 0.01, 'volatility': 0.25,
+                         'pricing_date': '20180531', 'div_list': [('20180615', 1.0)]}
+        self.assertAlmostEqual(self.eq_option_engine.valuation(),
+                               self.eq_option.engine(model='BSM', **market_kwargs).valuation(), places=10)
+        self.market.spot0 = 105
+        self.market.div_list = [('20180615', 2.0)]
+        market_kwargs.update(spot0=105, div_list=[('20180615', 2.0)])
+        self.assertAlmostEqual(self.eq_option_engine.valuation(),
+                               self.eq_option.engine(model='BSM', **market_kwargs).valuation(), places=10)
+
+    def test_overrides(self):
+        overrides = {'spot0': 100, 'rf_rate': 0.0, 'div_list': [('20180610', 3.0)]}
+        market_kwargs = dict({'yield_div': 0.01, 'volatility': 0.25, 'pricing_date': '20180531'}, **overrides)
+        eq_engines = {model: self.eq_option.engine(model=model, market=self.market, **overrides)
+                      for model in ('BSM', 'Binomial')}
+        for model, eq_engine in eq_engines.items():
+            self.assertAlmostEqual(eq_engine.valuation(),
+                                   self.eq_option.engine(model=model, **market_kwargs).valuation(), places=10)
+        fut_option = qbdp.FutOption(**dict(Input['futuresInst'], strike=108))
+        engine = fut_option.engine(model='B76', market=self.market, fwd0=108, rf_rate=0.03)
+        self.assertAlmostEqual(engine.valuation(), fut_option.engine(
+            model='B76', fwd0=108, rf_rate=0.03, volatility=0.25, pricing_date='20180531').valuation(), places=10)
+        #   only the fields that are not overridden follow the snapshot
+        self.market.spot0 = 120
+        self.market.rf_rate = 0.08
+        self.market.div_list = None
+        self.market.volatility = 0.3
+        market_kwargs['volatility'] = 0.3
+        for model, eq_engine in eq_engines.items():
+            self.assertAlmostEqual(eq_engine.valuation(),
+                                   self.eq_option.engine(model=model, **market_kwargs).valuation(), places=10)
+        self.assertAlmostEqual(engine.valuation(), fut_option.engine(
+            model='B76', fwd0=108, rf_rate=0.03, volatility=0.3, pricing_date='20180531').valuation(), places=10)
+
+    def test_precomputed(self):
+        market_kwargs = {'spot0': 110, 'rf_rate': 0.05, 'yield_div': 0.01, 'volatility': 0.25,
+                         'pricing_date': '20180531', 'div_list': [('20180615', 1.0)]}
+        options = [(qbdp.EqOption(option_type=option_type, strike=strike, expiry_date='20180630',
+                                  expiry_type=expiry_type), model)
+                   for strike in (95, 105) for option_type, expiry_type, model in
+                   (('Call', 'European', 'BSM'), ('Put', 'American', 'Binomial'), ('Put', 'American', 'BAW'),
+                    ('Call', 'European', 'MC_GBM'))]
+        engines = [(option.engine(model=model, market=self.market), option, model) for option, model in options]
+        for change in ({}, {'rf_rate': 0.03}, {'pricing_date': '20180604'}):
+            for name, value in change.items():
+                setattr(self.market, name, value)
+            market_kwargs.update(change)
+            with mock.patch('quantsbin.derivativepricing.pricingmodels.dividend_pv') as model_dividend_pv, \
+                    mock.patch('quantsbin.derivativepricing.pricingmodels.pv_div') as model_pv_div:
+                premiums = [engine.valuation() for engine, option, model in engines]
+            self.assertEqual(model_dividend_pv.call_count + model_pv_div.call_count, 0)
+            for premium, (engine, option, model) in zip(premiums, engines):
+                self.assertAlmostEqual(premium, option.engine(model=model, **market_kwargs).valuation(), places=10)
+        #   a bumped rate (numerical greeks, pnl attribution) drops the discount factor of the snapshot
+        model = engines[0][0]._model_class
+        model.rf_rate = 0.07
+        self.assertAlmostEqual(model.discount_factor, np.exp(-0.07 * model.maturity), places=15)
+        engine = options[0][0].engine(model='BSM', market=self.market, rf_rate=0.07)
+        self.assertAlmostEqual(engine.valuation(), options[0][0].engine(
+            model='BSM', **dict(market_kwargs, rf_rate=0.07)).valuation(), places=10)
+
+
+class Test_binomialGreeks(unittest.TestCase):
+    def setUp(self):
+        self.eq_option = qbdp.EqOption(**Input['equityInst'])
+        market_kwargs = dict(Input['equityEng'])
+        market_kwargs.pop('model')
+        self.bsm_engine = self.eq_option.engine(model='BSM', **market_kwargs)
+        self.binomial_engine = self.eq_option.engine(model='Binomial', no_of_steps=2000, **market_kwargs)
+
+    def test(self):
+        self.assertAlmostEqual(self.binomial_engine.valuation(), self.bsm_engine.valuation(), places=2)
+        bsm_risk_parameters = self.bsm_engine.risk_parameters()
+        #   BSM delta is N(d1) without the yield discount factor, the tree delta is compared to exp(-qT)N(d1)
+        bsm_model = self.bsm_engine._model_class
+        bsm_risk_parameters['delta'] = np.exp(-1 * bsm_model.cnv_yield * bsm_model.maturity) * norm.cdf(bsm_model.d1)
+        for name, value in self.binomial_engine.risk_parameters().items():
+            self.assertAlmostEqual(value / bsm_risk_parameters[name], 1, delta=0.005)
+
+    def test_central_differences(self):
+        eq_option = qbdp.EqOption(option_type='Put', strike=100, expiry_date='20190531')
+        market_kwargs = {'spot0': 100, 'pricing_date': '20180531', 'volatility': 0.25, 'rf_rate': 0.05}
+        bsm_risk_parameters = eq_option.engine(model='BSM', **market_kwargs).risk_parameters()
+        binomial_risk_parameters = eq_option.engine(model='Binomial', no_of_steps=500,
+                                                    **market_kwargs).risk_parameters()
+        for name in ('vega', 'rho'):
+            self.assertAlmostEqual(binomial_risk_parameters[name] / bsm_risk_parameters[name], 1, delta=0.002)
+
+
+class Test_binomialBatch(unittest.TestCase):
+    def setUp(self):
+        self.market_kwargs = {'spot0': 105, 'rf_rate': 0.05, 'volatility': 0.3, 'pricing_date': '20180610',
+                              'div_list': [('20180801', 1.0), ('20181015', 1.5)]}
+        self.chain = {'strike': [90, 100, 110, 120], 'option_type': ['Put', 'Call', 'Put', 'Call'],
+                      'expiry_date': ['20181210', '20180910', '20180910', '20181210']}
+        self.steps = {'20181210': 183, '20180910': 92}
+
+    def test(self):
+        for model_class in (BinomialModel, BinomialBBS, TrinomialModel):
+            for expiry_type in ('American', 'European'):
+                self._check_chain(model_class, expiry_type)
+
+    def _check_chain(self, model_class, expiry_type):
+        model = model_class(qbdp.EqOption(option_type='Put', strike=100, expiry_date='20181210',
+                                          expiry_type=expiry_type), no_of_steps=183, **self.market_kwargs)
+        premiums = model.valuation_batch(**self.chain)
+        for premium, strike, option_type, expiry_date in zip(premiums, *self.chain.values()):
+            option = qbdp.EqOption(option_type=option_type, strike=strike, expiry_date=expiry_date,
+                                   expiry_type=expiry_type)
+            self.assertAlmostEqual(premium, model_class(option, no_of_steps=self.steps[expiry_date],
+                                                        **self.market_kwargs).valuation(), places=10)
+
+    def test_richardson(self):
+        #   the half tree of BBSR is on its own step grid, so the chain shares the expiry of the instrument
+        model = BinomialBBSR(qbdp.EqOption(option_type='Put', strike=100, expiry_date='20181210',
+                                           expiry_type='American'), no_of_steps=183, **self.market_kwargs)
+        premiums = model.valuation_batch(strike=self.chain['strike'], option_type=self.chain['option_type'])
+        for premium, strike, option_type in zip(premiums, self.chain['strike'], self.chain['option_type']):
+            option = qbdp.EqOption(option_type=option_type, strike=strike, expiry_date='20181210',
+                                   expiry_type='American')
+            self.assertAlmostEqual(premium, BinomialBBSR(option, no_of_steps=183, **self.market_kwargs).valuation(),
+                                   places=10)
+
+
+class Test_latticeModels(unittest.TestCase):
+    def setUp(self):
+        self.eq_option = qbdp.EqOption(option_type='Put', strike=100, expiry_date='20190531', expiry_type='American')
+        self.market_kwargs = {'spot0': 100, 'pricing_date': '20180531', 'volatility': 0.25, 'rf_rate': 0.05,
+                              'yield_div': 0.01}
+
+    def test(self):
+        report = self.eq_option.engine(model='Binomial', **self.market_kwargs).convergence_report(steps=[100, 200])
+        self.assertEqual(list(report.index), [100, 200])
+        self.assertLess(abs(report['Binomial_BBSR'][100]), 0.001)
+        self.assertLess(abs(report['Binomial_BBS'][200]), abs(report['Binomial'][200]))
+        reference = self.eq_option.engine(model='Binomial', no_of_steps=5000, **self.market_kwargs).valuation()
+        for model in ('Binomial_BBS', 'Binomial_BBSR', 'Trinomial'):
+            engine = self.eq_option.engine(model=model, no_of_steps=400, **self.market_kwargs)
+            self.assertAlmostEqual(engine.valuation(), reference, places=2)
+            self.assertIn('gamma', engine.risk_parameters())
+
+    def test_odd_steps(self):
+        eq_option = qbdp.EqOption(option_type='Put', strike=100, expiry_date='20190531')
+        reference = eq_option.engine(model='BSM', **self.market_kwargs).valuation()
+        for no_of_steps in (21, 101):
+            model = eq_option.engine(model='Binomial_BBSR', no_of_steps=no_of_steps, **self.market_kwargs)._model_class
+            #   the weights cancel an error term of c/no_of_steps exactly, also when the half tree is not n/2
+            self.assertAlmostEqual(model._extrapolate(lambda tree: 1 + 1.0 / tree.no_of_steps), 1, places=12)
+            self.assertAlmostEqual(model.valuation(), reference, delta=0.002)
+
+
+class Test_americanApprox(unittest.TestCase):
+    def setUp(self):
+        self.eq_option = qbdp.EqOption(option_type='Put', strike=100, expiry_date='20190531', expiry_type='American')
+        self.market_kwargs = {'spot0': 100, 'pricing_date': '20180531', 'volatility': 0.3, 'rf_rate': 0.05,
+                              'div_list': [('20181001', 2.0)]}
+
+    def test(self):
+        reference = self.eq_option.engine(model='Binomial_BBSR', no_of_steps=1000, **self.market_kwargs)
+        for model in ('BAW', 'BjS2002'):
+            engine = self.eq_option.engine(model=model, **self.market_kwargs)
+            self.assertAlmostEqual(engine.valuation(), reference.valuation(), delta=0.1)
+            self.assertAlmostEqual(engine.risk_parameters()['delta'], reference.risk_parameters()['delta'], places=2)
+            model = engine._model_class
+            premiums, risk_parameters = model.price_batch(spot0=100, strike=[90, 100], maturity=model.maturity,
+                                                          volatility=0.3, rf_rate=0.05, pv_cnv=model.pv_cnv,
+                                                          option_type='Put')
+            self.assertAlmostEqual(premiums[1], engine.valuation(), places=10)
+        self.assertLessEqual(self.eq_option.engine(model='BjS2002', **self.market_kwargs).valuation(),
+                             reference.valuation())
+
+
+class Test_finiteDifference(unittest.TestCase):
+    def setUp(self):
+        self.market_kwargs = {'spot0': 100, 'pricing_date': '20180531', 'volatility': 0.25, 'rf_rate': 0.05,
+                              'yield_div': 0.01}
+
+    def test(self):
+        for expiry_type, reference_model in (('European', 'BSM'), ('American', 'Binomial_BBSR')):
+            eq_option = qbdp.EqOption(option_type='Put', strike=100, expiry_date='20190531', expiry_type=expiry_type)
+            reference = eq_option.engine(model=reference_model, no_of_steps=1000, **self.market_kwargs)
+            engine = eq_option.engine(model='FD_CN', no_of_steps=200, no_of_nodes=400, **self.market_kwargs)
+            self.assertAlmostEqual(engine.valuation(), reference.valuation(), places=2)
+            for name, value in engine.risk_parameters().items():
+                self.assertAlmostEqual(abs(value / reference.risk_parameters()[name]), 1, delta=0.01)
+            self.assertAlmostEqual(engine._model_class.grid_values([100])[0], engine.valuation(), places=12)
+
+    def test_default_grid(self):
+        for option_type, strike, spot0 in (('Put', 100, 100), ('Call', 120, 103.7), ('Put', 80, 91.3)):
+            eq_option = qbdp.EqOption(option_type=option_type, strike=strike, expiry_date='20190531')
+            market_kwargs = dict(self.market_kwargs, spot0=spot0)
+            reference = eq_option.engine(model='BSM', **market_kwargs)
+            model = eq_option.engine(model='FD_CN', **market_kwargs)._model_class
+            self.assertAlmostEqual(model.spot_grid[round(spot0 / model.spot_grid[1])], spot0, places=10)
+            self.assertAlmostEqual(model.valuation() / reference.valuation(), 1, delta=0.0005)
+            self.assertAlmostEqual(model.gamma() / reference.risk_parameters()['gamma'], 1, delta=0.001)
+
+
+class Test_chunkedMonteCarlo(unittest.TestCase):
+    def setUp(self):
+        self.eq_option = qbdp.EqOption(**Input['equityInst'])
+        self.market_kwargs = {'spot0': 110, 'pricing_date': '20180531', 'volatility': 0.25, 'rf_rate': 0.05,
+                              'cnv_yield': 0.01, 'no_of_path': 200000}
+
+    def test(self):
+        full = MonteCarloGBM(self.eq_option, **self.market_kwargs).valuation_estimate()
+        chunked = MonteCarloGBM(self.eq_option, chunk_size=30000, **self.market_kwargs).valuation_estimate()
+        self.assertAlmostEqual(full.premium, chunked.premium, places=10)
+        self.assertAlmostEqual(full.std_error, chunked.std_error, places=10)
+        bsm_premium = BSM(self.eq_option, **self.market_kwargs).valuation()
+        self.assertLess(abs(full.premium - bsm_premium), 4 * full.std_error)
+        stopped = MonteCarloGBM(self.eq_option, chunk_size=10000, target_std_error=0.05,
+                                **self.market_kwargs).valuation_estimate()
+        self.assertLessEqual(stopped.std_error, 0.05)
+        self.assertLess(stopped.no_of_path, 200000)
+
+
+
+class Test_randomStreams(unittest.TestCase):
+    def setUp(self):
+        self.am_option = qbdp.EqOption(option_type='Put', strike=100, expiry_date='20180630', expiry_type='American')
+        self.market_kwargs = {'spot0': 100, 'pricing_date': '20180531', 'volatility': 0.25, 'rf_rate': 0.05,
+                              'no_of_path': 20000, 'no_of_steps': 20, 'seed': 7}
+
+    def test(self):
+        global_state = np.random.get_state()[1].copy()
+        stimulation = MonteCarloGBM(self.am_option, **self.market_kwargs).stimulation_object()
+        full = stimulation.stimulation()
+        chunked = np.vstack(list(stimulation.stimulation_chunks(1)))
+        self.assertTrue(np.array_equal(full, chunked))
+        self.assertTrue(np.array_equal(global_state, np.random.get_state()[1]))
+        other_seed = dict(self.market_kwargs, seed=8)
+        self.assertFalse(np.array_equal(full, MonteCarloGBM(self.am_option, **other_seed).stimulation_method()))
+
+
+
+class Test_parallelMonteCarlo(unittest.TestCase):
+    def setUp(self):
+        self.market_kwargs = {'spot0': 100, 'pricing_date': '20180531', 'volatility': 0.25, 'rf_rate': 0.05,
+                              'no_of_path': 40000, 'no_of_steps': 20, 'chunk_size': 16384}
+
+    def test(self):
+        for expiry_type in ['European', 'American']:
+            option = qbdp.EqOption(option_type='Put', strike=100, expiry_date='20180630', expiry_type=expiry_type)
+            serial = MonteCarloGBM(option, **self.market_kwargs).valuation_estimate()
+            parallel = MonteCarloGBM(option, workers=2, **self.market_kwargs).valuation_estimate()
+            self.assertEqual(serial, parallel)
+        binomial_premium = BinomialModel(option, **self.market_kwargs).valuation()
+        self.assertLess(abs(serial.premium - binomial_premium), 4 * serial.std_error)
+        unchunked = MonteCarloGBM(option, **dict(self.market_kwargs, chunk_size=None)).valuation()
+        self.assertAlmostEqual(serial.premium, unchunked, places=10)
+
+
+
+class Test_quasiMonteCarlo(unittest.TestCase):
+    def setUp(self):
+        self.eq_option = qbdp.EqOption(**Input['equityInst'])
+        self.market_kwargs = {'spot0': 110, 'pricing_date': '20180531', 'volatility': 0.25, 'rf_rate': 0.05,
+                              'cnv_yield': 0.01, 'random_sequence': 'Sobol'}
+
+    def test(self):
+        bsm_premium = BSM(self.eq_option, **self.market_kwargs).valuation()
+        sobol = MonteCarloGBM(self.eq_option, no_of_path=16384, **self.market_kwargs).valuation_estimate()
+        self.assertEqual(sobol.no_of_path, 16384)
+        self.assertLess(sobol.std_error, 0.01)
+        self.assertLess(abs(sobol.premium - bsm_premium), 4 * sobol.std_error)
+        path_kwargs = dict(self.market_kwargs, no_of_path=4096, no_of_steps=20, div_list=[('20180615', 1)])
+        bridge = MonteCarloGBM(self.eq_option, **path_kwargs).valuation_estimate()
+        pseudo = MonteCarloGBM(self.eq_option, **dict(path_kwargs, random_sequence='Pseudo')).valuation_estimate()
+        self.assertLess(bridge.std_error, pseudo.std_error / 5)
+
+
+
+class Test_controlVariates(unittest.TestCase):
+    def setUp(self):
+        self.market_kwargs = {'spot0': 100, 'pricing_date': '20180531', 'volatility': 0.25, 'rf_rate': 0.05,
+                              'cnv_yield': 0.01, 'no_of_path': 20000, 'no_of_steps': 25}
+
+    def test(self):
+        eu_option = qbdp.EqOption(option_type='Call', strike=100, expiry_date='20190531')
+        plain = MonteCarloGBM(eu_option, **self.market_kwargs).valuation_estimate()
+        controlled = MonteCarloGBM(eu_option, control_variate='Underlying', **self.market_kwargs).valuation_estimate()
+        self.assertLess(controlled.std_error, plain.std_error / 2)
+        self.assertLess(abs(controlled.premium - BSM(eu_option, **self.market_kwargs).valuation()),
+                        4 * controlled.std_error)
+        am_option = qbdp.EqOption(option_type='Put', strike=100, expiry_date='20190531', expiry_type='American')
+        plain = MonteCarloGBM(am_option, **self.market_kwargs).valuation_estimate()
+        controlled = MonteCarloGBM(am_option, control_variate='European', **self.market_kwargs).valuation_estimate()
+        self.assertLess(controlled.std_error, plain.std_error / 10)
+        self.assertLess(abs(controlled.premium - plain.premium), 4 * plain.std_error)
+        expiry_kwargs = dict(self.market_kwargs, div_list=[('20190531', 5.0)])
+        stimulation = MonteCarloGBM(eu_option, **expiry_kwargs).stimulation_object()
+        self.assertAlmostEqual(stimulation.stimulation_chunk(0, 20000)[:, -1].mean(),
+                               stimulation.expected_final_value(), delta=0.5)
+        plain = MonteCarloGBM(eu_option, **expiry_kwargs).valuation_estimate()
+        controlled = MonteCarloGBM(eu_option, control_variate='Underlying', **expiry_kwargs).valuation_estimate()
+        self.assertLess(abs(controlled.premium - plain.premium), 4 * plain.std_error)
+
+
+
+class Test_leanLSM(unittest.TestCase):
+    def setUp(self):
+        self.am_option = qbdp.EqOption(option_type='Put', strike=100, expiry_date='20190531', expiry_type='American')
+        self.market_kwargs = {'spot0': 100, 'pricing_date': '20180531', 'volatility': 0.25, 'rf_rate': 0.05,
+                              'no_of_path': 20000, 'no_of_steps': 25, 'antithetic': True,
+                              'div_list': [('20180901', 2), ('20190301', 2)]}
+
+    def test(self):
+        stimulation = MonteCarloGBM(self.am_option, **self.market_kwargs).stimulation_object()
+        full = stimulation.stimulation_chunk(0, 20000)
+        for step, spots in stimulation.path_slices(0, 20000, lean=True):
+            self.assertTrue(np.allclose(spots, full[:, step], rtol=1e-10))
+        lean = MonteCarloGBM(self.am_option, path_storage='Lean', **self.market_kwargs).valuation()
+        stored = MonteCarloGBM(self.am_option, path_storage='Full', **self.market_kwargs).valuation()
+        self.assertAlmostEqual(lean, stored, places=8)
+        expiry_kwargs = dict(self.market_kwargs, div_list=[('20190531', 2.0)])
+        lean = MonteCarloGBM(self.am_option, path_storage='Lean', **expiry_kwargs).valuation()
+        stored = MonteCarloGBM(self.am_option, path_storage='Full', **expiry_kwargs).valuation()
+        self.assertAlmostEqual(lean, stored, places=8)
+
+
+
+class Test_monteCarloBatch(unittest.TestCase):
+    def setUp(self):
+        self.market_kwargs = {'spot0': 100, 'pricing_date': '20180531', 'volatility': 0.25, 'rf_rate': 0.05,
+                              'no_of_path': 20000, 'no_of_steps': 25}
+        self.strikes = [90, 100, 110]
+
+    def test(self):
+        am_option = qbdp.EqOption(option_type='Put', strike=100, expiry_date='20180930', expiry_type='American')
+        chain = MonteCarloGBM(am_option, **self.market_kwargs).valuation_batch(self.strikes, full_output=True)
+        for strike, estimate in zip(self.strikes, chain):
+            single = qbdp.EqOption(option_type='Put', strike=strike, expiry_date='20180930', expiry_type='American')
+            premium = MonteCarloGBM(single, **self.market_kwargs).valuation()
+            self.assertLess(abs(estimate.premium - premium), estimate.std_error)
+        eu_option = qbdp.EqOption(option_type='Call', strike=100, expiry_date='20180930')
+        premiums = MonteCarloGBM(eu_option, **self.market_kwargs).valuation_batch(self.strikes, option_type='Put')
+        for strike, premium in zip(self.strikes, premiums):
+            put = qbdp.EqOption(option_type='Put', strike=strike, expiry_date='20180930')
+            self.assertLess(abs(premium - BSM(put, **self.market_kwargs).valuation()), 0.1)
+
+
+
+class Test_pathStore(unittest.TestCase):
+    def setUp(self):
+        self.am_option = qbdp.EqOption(option_type='Put', strike=100, expiry_date='20190531', expiry_type='American')
+        self.market_kwargs = {'spot0': 100, 'pricing_date': '20180531', 'volatility': 0.25, 'rf_rate': 0.05,
+                              'no_of_path': 20000, 'no_of_steps': 20, 'chunk_size': 16384,
+                              'div_list': [('20180901', 2)]}
+
+    def test(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path_file = os.path.join(directory, 'paths.dat')
+            stored = MonteCarloGBM(self.am_option, path_storage='Full', **self.market_kwargs).valuation()
+            self.assertEqual(MonteCarloGBM(self.am_option, path_file=path_file, **self.market_kwargs).valuation(),
+                             stored)
+            os.remove(path_file + '.json')
+            self.assertRaises(KeyError, PathStore.create(path_file, MonteCarloGBM(
+                self.am_option, **self.market_kwargs).stimulation_object(), [(0, 16384)]).final_spots, 16384)
+            written = MonteCarloGBM(self.am_option, path_file=path_file, **self.market_kwargs).valuation()
+            modified = os.path.getmtime(path_file)
+            reused = MonteCarloGBM(self.am_option, path_file=path_file, **self.market_kwargs).valuation()
+            self.assertEqual(written, reused)
+            self.assertEqual(modified, os.path.getmtime(path_file))
+
+
+
+class Test_pathCache(unittest.TestCase):
+    def setUp(self):
+        self.market_kwargs = {'spot0': 100, 'pricing_date': '20180531', 'volatility': 0.25, 'rf_rate': 0.05,
+                              'no_of_path': 20000}
+
+    def test(self):
+        butterfly = qbdp.StdStrategies(name='butterfly_call', expiry_date='20190531', low_strike=90, strike_spread=10)
+        engine = butterfly.engine(model='MC_GBM', **self.market_kwargs)
+        premium = engine.valuation()
+        self.assertEqual(engine.path_cache.cache_info()[:3], (3, 1, 1))
+        legs = sum(MonteCarloGBM(option, **self.market_kwargs).valuation() * position
+                   for option, position in butterfly.option_portfolio)
+        self.assertAlmostEqual(premium, legs, places=10)
+        cache = PathCache(max_bytes=200000)
+        for volatility in [0.2, 0.25, 0.2]:
+            MonteCarloGBM(butterfly.option_portfolio[0][0], path_cache=cache,
+                          **dict(self.market_kwargs, volatility=volatility)).valuation()
+        self.assertEqual(cache.cache_info()[:3], (0, 3, 1))
+
+    def test_plotting(self):
+        butterfly = qbdp.StdStrategies(name='butterfly_call', expiry_date='20190531', low_strike=90, strike_spread=10)
+        engine = butterfly.engine(model='MC_GBM', **dict(self.market_kwargs, no_of_path=2000))
+        plot = qbdp.Plotting(engine, 'valuation', x_axis_range=[90, 110], no_of_points=5)
+        premiums = plot._y()
+        #   one simulation per plot point shared by the legs, the copies of the engine use the same cache
+        self.assertEqual(engine.path_cache.cache_info()[:3], (15, 5, 5))
+        self.assertEqual(plot._y(), premiums)
+        self.assertEqual(engine.path_cache.cache_info()[:3], (35, 5, 5))
+
+
+
+class Test_dividendPaths(unittest.TestCase):
+    def test(self):
+        normals = np.random.default_rng(1).standard_normal((1000, 50))
+        dividends = [(0.0, 1.0), (0.3, 0.5), (0.3, 0.7), (0.75, 2.0)]
+        stimulation = GeometricBrownianMotion(100, 1.0, drift=0.04, volatility=0.3, stimulation_type='Path',
+                                              no_of_steps=50, div_list_processed=dividends)
+        increments = (0.04 - 0.3 ** 2 / 2) * 0.02 + 0.3 * np.sqrt(0.02) * normals
+        log_spots = np.hstack((np.zeros((1000, 1)), np.cumsum(increments, axis=1)))
+        expected = 100 * np.exp(log_spots)
+        for time, amount in dividends:
+            step = int(time / 0.02)
+            expected[:, step + 1:] -= amount * np.exp(log_spots[:, step + 1:] - log_spots[:, [step]])
+        self.assertTrue(np.allclose(stimulation._stimulate_path(normals), expected, rtol=1e-12))
+
+
+class Test_float32Paths(unittest.TestCase):
+    def test(self):
+        normals = np.random.default_rng(2).standard_normal((1000, 1))
+        stimulation = GeometricBrownianMotion(100, 1.0, drift=0.04, volatility=0.3, stimulation_type='Final',
+                                              no_of_path=1000, antithetic=True, random_array=normals,
+                                              div_list_processed=[])
+        expected = 100 * np.exp((0.04 - 0.3 ** 2 / 2) + 0.3 * np.vstack((normals, -normals)))
+        self.assertTrue(np.allclose(stimulation.stimulation(), expected, rtol=1e-12))
+        option = qbdp.EqOption(option_type='Call', strike=100, expiry_date='20180630')
+        models = [MonteCarloGBM(option, spot0=100, pricing_date='20180531', volatility=.25, rf_rate=.05,
+                                no_of_path=100000, antithetic=True, dtype=dtype) for dtype in (None, np.float32)]
+        self.assertEqual(models[1].stimulation_object().stimulation().dtype, np.float32)
+        estimates = [model.valuation_estimate() for model in models]
+        self.assertLess(abs(estimates[0].premium - estimates[1].premium), estimates[0].std_error)
+
+
+class Test_monteCarloGreeks(unittest.TestCase):
+    def setUp(self):
+        self.market_kwargs = {'spot0': 100, 'pricing_date': '20180531', 'volatility': 0.25, 'rf_rate': 0.05,
+                              'antithetic': True}
+
+    def test(self):
+        eq_option = qbdp.EqOption(option_type='Put', strike=105, expiry_date='20181231')
+        reference = eq_option.engine(model='BSM', **self.market_kwargs).risk_parameters()
+        greeks = MonteCarloGBM(eq_option, no_of_path=200000, **self.market_kwargs).risk_parameters_estimate()
+        reference['delta'] = -1 * reference['delta']
+        for name in ['delta', 'gamma', 'theta', 'vega', 'rho']:
+            self.assertLess(abs(greeks[name].value - reference[name]), 4 * greeks[name].std_error)
+        am_option = qbdp.EqOption(option_type='Put', strike=105, expiry_date='20181231', expiry_type='American')
+        reference = am_option.engine(model='Binomial', no_of_steps=500, **self.market_kwargs).risk_parameters()
+        engine = am_option.engine(model='MC_GBM', no_of_path=20000, no_of_steps=50, **self.market_kwargs)
+        greeks = engine._model_class.risk_parameters_estimate()
+        for name in ['delta', 'gamma', 'theta', 'vega', 'rho']:
+            self.assertLess(abs(greeks[name].value - reference[name]),
+                            max(4 * greeks[name].std_error, 0.05 * abs(reference[name])))
+        self.assertEqual(engine.risk_parameters()['vega'], greeks['vega'].value)
+
+    def test_cached_estimates(self):
+        eq_option = qbdp.EqOption(option_type='Put', strike=105, expiry_date='20181231')
+        model = MonteCarloGBM(eq_option, no_of_path=2000, seed=7, **self.market_kwargs)
+        calls = []
+        chain_stats = model._chain_stats
+        model._chain_stats = lambda *args: calls.append(args[2:]) or chain_stats(*args)
+        premium = model.valuation()
+        model.valuation_estimate()
+        self.assertEqual(calls, [(False,)])
+        greeks = model.risk_parameters()
+        self.assertEqual(greeks['vega'], model.vega())
+        self.assertEqual(calls, [(False,), (True,)])
+        self.assertEqual(premium, MonteCarloGBM(eq_option, no_of_path=2000, seed=7, **self.market_kwargs).valuation())
+        model.update(spot0=101)
+        self.assertNotEqual(model.valuation(), premium)
+        model.risk_parameters()
+        self.assertEqual(calls, [(False,), (True,), (False,), (True,)])
+
+
+class Test_multiAssetPaths(unittest.TestCase):
+    def test(self):
+        single = GeometricBrownianMotion(100, 1.0, drift=0.05, volatility=0.2, stimulation_type='Path',
+                                         no_of_path=20000, no_of_steps=10, seed=1, antithetic=True,
+                                         div_list_processed=[])
+        multi = mc_methd_mapper['MultiGBM']([100], 1.0, drift=0.05, volatility=0.2, stimulation_type='Path',
+                                            no_of_path=20000, no_of_steps=10, seed=1, antithetic=True)
+        self.assertTrue(np.allclose(multi.stimulation()[:, :, 0], single.stimulation(), rtol=1e-12))
+        multi = mc_methd_mapper['MultiGBM']([100, 90], 0.5, drift=0.05, volatility=[0.2, 0.3],
+                                            correlation=[[1, 0.6], [0.6, 1]], no_of_path=500000, seed=2)
+        spots = multi.stimulation()
+        self.assertAlmostEqual(np.corrcoef(np.log(spots).T)[0, 1], 0.6, places=2)
+        values = np.exp(-0.05 * 0.5) * payoff_mapper['Spread'](spots, 0.0)
+        volatility = np.sqrt(0.2 ** 2 + 0.3 ** 2 - 2 * 0.6 * 0.2 * 0.3)
+        d1 = (np.log(100 / 90) + volatility ** 2 * 0.25) / (volatility * np.sqrt(0.5))
+        exchange = 100 * norm.cdf(d1) - 90 * norm.cdf(d1 - volatility * np.sqrt(0.5))
+        self.assertLess(abs(values.mean() - exchange), 4 * values.std() / np.sqrt(len(values)))
+        self.assertTrue(np.allclose(payoff_mapper['Basket'](spots, 95), np.maximum(spots.mean(axis=1) - 95, 0)))
+
+
 # eqOption1 = qbdp.EqOption(option_type='Call', strike=100, expiry_date='20180630')
 # models = eqOption1.list_models()
 # eqOption1_pricer = eqOption1.engine(model='BSM', spot0=100, pricing_date='20180531', volatility=.25,